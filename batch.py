@@ -0,0 +1,104 @@
+from itertools import accumulate
+
+from gen import gen, generated_count
+
+
+# several rules generated as a single one: their parsed structures are merged into one alternation where the
+# consecutive rules starting with the same characters share them, like in a trie, and the strings come out rule
+# after rule in the order of the rules, so that the strings of each rule are a contiguous range of the output
+def read_rules(file):
+    # one rule per line, empty lines are skipped
+    with open(file, encoding="utf-8") as f:
+        return [rule for rule in (line.rstrip("\r\n") for line in f) if len(rule) > 0]
+
+
+def literal(option):
+    # the single string generated by an or node, None when it generates something else
+    if isinstance(option, str):
+        return option
+    if len(option) == 1 and isinstance(option[0], str):
+        return option[0]
+    return None
+
+
+def common_prefix(rules):
+    # number of leading or nodes generating the same single string in all the rules
+    n = 0
+    while all(len(r) > n for r in rules):
+        first = literal(rules[0][n])
+        if first is None or any(literal(r[n]) != first for r in rules[1:]):
+            break
+        n += 1
+    return n
+
+
+def merge_or(rules):
+    # an or node generating the strings of each and node of rules one after the other
+    alternatives = []
+    i = 0
+    while i < len(rules):
+        j = i + 1
+        while j < len(rules) and common_prefix(rules[i : j + 1]) > 0:
+            j += 1
+        if j - i == 1:
+            alternatives.append(rules[i])
+        else:
+            n = common_prefix(rules[i:j])
+            tails = [r[n:] if len(r) > n else [[""]] for r in rules[i:j]]
+            alternatives.append(rules[i][:n] + [merge_or(tails)])
+        i = j
+    return alternatives
+
+
+def merge(rules):
+    return [merge_or(rules)]
+
+
+class batch:
+    def __init__(self, rules, parsed, **filters):
+        self.rules = rules
+        self.parsed = parsed
+        self.filters = filters  # FILTERS of gen(), the order of the rules is kept so there is no order
+        self.options = merge(parsed)
+        self.counts = [generated_count(options, **filters) for options in parsed]  # ValueError for infinite rules
+        self.offsets = list(accumulate(self.counts, initial=0))  # the strings of rule i are [offsets[i], offsets[i + 1])
+
+    def count(self, unique=False):
+        if unique:
+            return generated_count(self.options, unique=True, **self.filters)
+        return self.offsets[-1]
+
+    def gen(self, start=None, stop=None, jobs=None, unique=False, on_rule=None, backend="recursive", stats=None):
+        # with unique each string comes once over all the rules, the order of the rules is not kept then
+        if unique:
+            return gen(self.options, start=start, stop=stop, unique=True, **self.filters)
+        start, stop, _ = slice(start, stop).indices(self.offsets[-1])
+        if jobs is not None and jobs > 1 and all(v is None for k, v in self.filters.items() if k != "max_len"):
+            import parallel
+
+            generated = parallel.gen(self.options, jobs=jobs, start=start, stop=stop, max_len=self.filters.get("max_len"))
+        else:
+            whole = start == 0 and stop == self.offsets[-1]  # walked without an index then, instrumented by stats
+            generated = gen(self.options, start=None if whole else start, stop=None if whole else stop, backend=backend, stats=stats, **self.filters)
+        return generated if on_rule is None else self.progress(generated, start, stop, on_rule)
+
+    def progress(self, generated, start, stop, on_rule):
+        # calls on_rule(i) as soon as the last string of rule i within [start, stop) is generated
+        pending = [
+            i
+            for i, n in enumerate(self.counts)
+            if (n > 0 and self.offsets[i + 1] > start and self.offsets[i] < stop) or (n == 0 and start <= self.offsets[i] <= stop)
+        ]
+        k = 0
+
+        def report(n):
+            nonlocal k
+            while k < len(pending) and min(self.offsets[pending[k] + 1], stop) <= n:
+                on_rule(pending[k])
+                k += 1
+
+        report(start)
+        for n, s in enumerate(generated, start=start + 1):
+            yield s
+            report(n)
+        report(stop)
@@ -0,0 +1,200 @@
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from itertools import islice
+
+from gen import BACKENDS, count, gen, parse
+
+# rules representative of the parts of the engine, with the number of strings generated from each of them
+CORPUS = {
+    "long literal": ("the quick brown fox jumps over the lazy dog " * 40, 1),
+    "deep groups": ("(a|" * 40 + "b" + ")" * 40 + "(c|d)" * 8, 100_000),
+    "wide class": ("\\W{3}", 100_000),
+    "negated class": ("[^a]{2}\\d", 100_000),
+    "large count": ("[ab]{0,16}", 100_000),
+    "long repetition": ("a{1,300}", 300),
+    "many alternatives": ("(" + "|".join(f"word{i}" for i in range(1000)) + ")\\d", 10_000),
+    "passwords": ("(admin|root|user|guest)[._-]?\\d{4}", 100_000),
+    "product": ("\\w{4}", 300_000),
+}
+
+# rules failing with a backend, name -> (backend, exception name), they are recorded as such instead of measured
+# and compared only to check that they do not fail with another exception
+KNOWN_FAILURES = dict()
+
+# rule, number of strings and worker counts of the scaling of parallel.encoded() with the number of processes
+SCALING = ("\\w{4}", 2_000_000, (1, 2, 4))
+
+# metrics where a higher value is better, for all the others lower is better
+HIGHER_IS_BETTER = ("strings_per_second",)
+THRESHOLD = 0.5  # fraction a metric may get worse than the baseline before failing
+MIN_TIME = 100e-6  # seconds, and bytes below, differences smaller than these are noise whatever the ratio
+MIN_MEMORY = 64 * 1024
+
+
+def best_time(f, repeat):
+    # without the garbage collector, like timeit, it adds noise
+    best = float("inf")
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            t = time.perf_counter()
+            f()
+            best = min(best, time.perf_counter() - t)
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+
+def peak_memory(f):
+    # peak of the memory allocated by f, above what was allocated before
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        f()
+        return tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+
+
+def measure(rule, limit, repeat=5, backend="recursive"):
+    # parse time, first output latency and strings per second are the best of repeat runs, memory is measured
+    # apart since tracing the allocations slows everything down
+    parsed = parse(rule)
+
+    def first():
+        next(iter(gen(parsed, backend=backend)))
+
+    def generate():
+        for _ in islice(gen(parsed, backend=backend), limit):
+            pass
+
+    n = sum(1 for _ in islice(gen(parsed, backend=backend), limit))
+    seconds = best_time(generate, repeat)
+    return {
+        "strings": n,
+        "parse_seconds": best_time(lambda: parse(rule), repeat),
+        "parse_peak_bytes": peak_memory(lambda: parse(rule)),
+        "first_output_seconds": best_time(first, repeat),
+        "strings_per_second": n / seconds if seconds > 0 else 0.0,
+        "gen_peak_bytes": peak_memory(generate),
+    }
+
+
+def scaling(rule, limit, jobs, repeat=5):
+    # strings per second of parallel.encoded() with each number of worker processes, and its speedup over the
+    # first one, the process pool is started by each run
+    import parallel
+
+    parsed = parse(rule)
+    n = min(limit, count(parsed))
+
+    def generate(j):
+        for _ in parallel.encoded(parsed, jobs=j, stop=n):
+            pass
+
+    rates = {str(j): n / best_time(lambda: generate(j), repeat) for j in jobs}  # str keys, like once saved as json
+    return {"rule": rule, "strings": n, "strings_per_second": rates, "speedup": {j: r / rates[str(jobs[0])] for j, r in rates.items()}}
+
+
+def run(corpus=None, repeat=5, backend="recursive", on_result=None):
+    results = dict()
+    for name, (rule, limit) in (CORPUS if corpus is None else corpus).items():
+        try:
+            results[name] = measure(rule, limit, repeat=repeat, backend=backend)
+        except Exception as e:
+            if KNOWN_FAILURES.get(name) != (backend, type(e).__name__):
+                raise
+            results[name] = {"known_failure": type(e).__name__}
+        if on_result is not None:
+            on_result(name, results[name])
+    return {"python": platform.python_version(), "backend": backend, "results": results}
+
+
+def worse(metric, value, baseline):
+    # how much worse value is than baseline, as a fraction of baseline, 0 when it is not worse or too close to tell
+    if metric == "strings":
+        return 0.0
+    if metric in HIGHER_IS_BETTER:
+        return max(0.0, (baseline - value) / baseline) if baseline > 0 else 0.0
+    if value - baseline < (MIN_MEMORY if metric.endswith("_bytes") else MIN_TIME):
+        return 0.0
+    return (value - baseline) / baseline if baseline > 0 else float("inf")
+
+
+def compare(results, baseline, threshold=THRESHOLD):
+    # (name, metric, value, baseline value, how much worse) of the metrics worse than the baseline by more than
+    # threshold, the rules or metrics missing from either side are skipped
+    regressions = []
+    for name, metrics in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        if "known_failure" in metrics or "known_failure" in base:
+            if metrics.get("known_failure", base.get("known_failure")) != base.get("known_failure"):
+                regressions.append((name, "known_failure", metrics["known_failure"], None, float("inf")))  # it did not fail before
+            continue
+        if base.get("strings") != metrics["strings"]:
+            regressions.append((name, "strings", metrics["strings"], base.get("strings"), float("inf")))  # not the same work
+            continue
+        for metric, value in metrics.items():
+            if metric in base and worse(metric, value, base[metric]) > threshold:
+                regressions.append((name, metric, value, base[metric], worse(metric, value, base[metric])))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="measure the speed and memory of parse() and gen() over a corpus of rules")
+    parser.add_argument("-o", "--output", metavar="FILE", default=None, help="save the results to this json file")
+    parser.add_argument("--baseline", metavar="FILE", default=None, help="compare the results to the ones saved in this json file, exit with 1 if any of them got worse by more than the threshold")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="fraction a metric may get worse than the baseline, default: %(default)s")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of each measure, the best one is kept, default: %(default)s")
+    parser.add_argument("--backend", choices=BACKENDS, default="recursive", help="generation engine to measure, default: %(default)s")
+    parser.add_argument("--only", metavar="NAME", action="append", default=None, help="only measure this rule of the corpus, can be repeated")
+    parser.add_argument("--scaling", metavar="JOBS", type=int, nargs="*", default=None, help=f"also measure how parallel generation scales with these numbers of worker processes, default: {' '.join(map(str, SCALING[2]))}")
+    args = parser.parse_args(argv)
+    if args.only is not None and any(name not in CORPUS for name in args.only):
+        parser.error(f"unknown rules {[name for name in args.only if name not in CORPUS]!r}, expected some of {list(CORPUS)!r}")
+    corpus = CORPUS if args.only is None else {name: CORPUS[name] for name in args.only}
+
+    def on_result(name, metrics):
+        if "known_failure" in metrics:
+            print(f"{name:<18} known failure: {metrics['known_failure']}", file=sys.stderr)
+            return
+        print(f"{name:<18} parse {metrics['parse_seconds'] * 1e6:>10.1f}us {metrics['parse_peak_bytes']:>10}B  first {metrics['first_output_seconds'] * 1e6:>10.1f}us  {metrics['strings_per_second']:>12.0f} strings/s {metrics['gen_peak_bytes']:>10}B", file=sys.stderr)
+
+    results = run(corpus, repeat=args.repeat, backend=args.backend, on_result=on_result)
+    if args.scaling is not None:
+        rule, limit, jobs = SCALING
+        results["scaling"] = scaling(rule, limit, tuple(args.scaling) or jobs, repeat=args.repeat)
+        for j, rate in results["scaling"]["strings_per_second"].items():
+            print(f"{rule} with {j:>3} processes {rate:>12.0f} strings/s, x{results['scaling']['speedup'][j]:.2f}", file=sys.stderr)
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("backend", "recursive") != args.backend:
+            parser.error(f"the baseline {args.baseline!r} was measured with the {baseline.get('backend')!r} backend")
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, value, base, fraction in regressions:
+            if metric == "known_failure":
+                print(f"regression {name}: fails with {value} but did not in the baseline", file=sys.stderr)
+                continue
+            print(f"regression {name}: {metric} {value:.6g} against {base!r} in the baseline, {fraction:.0%} worse", file=sys.stderr)
+        if len(regressions) > 0:
+            parser.exit(1, f"{len(regressions)} metrics worse than the baseline by more than {args.threshold:.0%}\n")
+        print("no regression against the baseline", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+
+from escapes import ascii_printable
+
+LIST_LIMIT = 256  # smaller sets are turned into plain lists once parsed, bigger ones are indexed by their ranges
+
+
+# set of characters stored as ranges of codepoints, generated in the order they were added,
+# optionally followed by the empty string
+class charset:
+    __slots__ = ("ranges", "optional", "starts", "ends", "offsets")
+
+    def __init__(self, chars="", optional=False):
+        self.ranges = []  # [first, last] codepoints, in generation order
+        self.optional = optional
+        self.starts = []  # sorted first codepoints of the merged ranges, for membership
+        self.ends = []  # matching last codepoints
+        self.offsets = None  # index of the first character of each range, built lazily
+        for c in chars:
+            self.add_range(ord(c), ord(c))
+
+    def copy(self, optional=None):
+        c = charset(optional=self.optional if optional is None else optional)
+        c.ranges = [r.copy() for r in self.ranges]
+        c.starts = self.starts.copy()
+        c.ends = self.ends.copy()
+        return c
+
+    def add(self, chars):
+        if isinstance(chars, charset):
+            for first, last in chars.ranges:
+                self.add_range(first, last)
+            self.optional = self.optional or chars.optional
+        elif len(chars) == 0:
+            self.optional = True
+        else:
+            for c in chars:
+                self.add_range(ord(c), ord(c))
+
+    def add_range(self, first, last):
+        # the part of the range not already in the set is appended to it
+        i = bisect_left(self.ends, first)
+        c = first
+        while i < len(self.starts) and self.starts[i] <= last:
+            if self.starts[i] > c:
+                self.append_range(c, self.starts[i] - 1)
+            c = max(c, self.ends[i] + 1)
+            i += 1
+        if c <= last:
+            self.append_range(c, last)
+        # merge it with the overlapping and adjacent ranges
+        lo = bisect_left(self.ends, first - 1)
+        hi = bisect_right(self.starts, last + 1)
+        if lo < hi:
+            first, last = min(first, self.starts[lo]), max(last, self.ends[hi - 1])
+        self.starts[lo:hi] = [first]
+        self.ends[lo:hi] = [last]
+
+    def append_range(self, first, last):
+        if len(self.ranges) > 0 and self.ranges[-1][1] + 1 == first:
+            self.ranges[-1][1] = last
+        else:
+            self.ranges.append([first, last])
+        self.offsets = None
+
+    def difference(self, other):
+        c = charset(optional=self.optional and not other.optional)
+        for first, last in self.ranges:
+            i = bisect_left(other.ends, first)
+            while i < len(other.starts) and other.starts[i] <= last:
+                if other.starts[i] > first:
+                    c.add_range(first, other.starts[i] - 1)
+                first = max(first, other.ends[i] + 1)
+                i += 1
+            if first <= last:
+                c.add_range(first, last)
+        return c
+
+    def __or__(self, other):
+        c = self.copy()
+        c.add(other)
+        return c
+
+    def __len__(self):
+        if self.offsets is None:
+            self.offsets = list(accumulate((last - first + 1 for first, last in self.ranges), initial=0))
+        return self.offsets[-1] + self.optional
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in range(*k.indices(len(self)))]
+        n = len(self)
+        if k < 0:
+            k += n
+        if not 0 <= k < n:
+            raise IndexError("charset index out of range")
+        if k == self.offsets[-1]:
+            return ""
+        r = bisect_right(self.offsets, k) - 1
+        return chr(self.ranges[r][0] + k - self.offsets[r])
+
+    def __iter__(self):
+        return self.chars()
+
+    def chars(self, start=0):
+        # the strings from the start-th one, without going through the ones before
+        n = len(self)
+        r = bisect_right(self.offsets, start) - 1
+        skip = start - self.offsets[r]
+        for first, last in self.ranges[r:]:
+            for c in range(first + skip, last + 1):
+                yield chr(c)
+            skip = 0
+        if self.optional and start < n:
+            yield ""
+
+    def __contains__(self, c):
+        if len(c) != 1:
+            return c == "" and self.optional
+        i = bisect_right(self.starts, ord(c)) - 1
+        return i >= 0 and ord(c) <= self.ends[i]
+
+    def count_range(self, first, last):
+        # number of characters with a codepoint from first to last, both included
+        i = bisect_left(self.ends, first)
+        n = 0
+        while i < len(self.starts) and self.starts[i] <= last:
+            n += min(last, self.ends[i]) - max(first, self.starts[i]) + 1
+            i += 1
+        return n
+
+    def between(self, first, last):
+        # the characters with a codepoint from first to last, both included, in generation order, without ""
+        for start, end in self.ranges:
+            for c in range(max(start, first), min(end, last) + 1):
+                yield chr(c)
+
+    def lowest(self):
+        return chr(self.starts[0]) if len(self.starts) > 0 else None
+
+    def highest(self):
+        return chr(self.ends[-1]) if len(self.ends) > 0 else None
+
+    def key(self):
+        return (tuple(map(tuple, self.ranges)), self.optional)
+
+    def __eq__(self, other):
+        if isinstance(other, charset):
+            return self.key() == other.key()
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None  # mutable, use key()
+
+    def __repr__(self):
+        items = [repr(chr(first)) if first == last else f"{chr(first)!r}-{chr(last)!r}" for first, last in self.ranges]
+        if self.optional:
+            items.append("''")
+        return "<" + ", ".join(items) + ">"
+
+
+def from_ranges(*ranges):
+    c = charset()
+    for first, last in ranges:
+        c.add_range(ord(first), ord(last))
+    return c
+
+
+# the characters the negated sets and escapes are taken from, all of them in codepoint order
+ALPHABETS = {
+    "ascii": charset(ascii_printable),
+    "latin-1": charset(ascii_printable) | from_ranges(("\xa0", "\xff")),
+    "unicode": from_ranges(("\x00", "\ud7ff"), ("\ue000", "\U0010ffff")),  # without the surrogates, they can't be encoded
+}
+
+alphabet = ALPHABETS["ascii"]
+alphabet_name = "ascii"
+
+
+def set_alphabet(name):
+    global alphabet, alphabet_name
+    if name not in ALPHABETS:
+        raise ValueError(f"unknown alphabet {name!r}, expected one of {tuple(ALPHABETS)}")
+    alphabet = ALPHABETS[name]
+    alphabet_name = name
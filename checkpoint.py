@@ -0,0 +1,22 @@
+import json
+import os
+
+FORMAT_VERSION = 1
+
+
+def save(file, state):
+    # write a new file and rename it over the old one, so a preempted job never leaves a truncated checkpoint
+    tmp = f"{file}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": FORMAT_VERSION, **state}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, file)
+
+
+def load(file):
+    with open(file, encoding="utf-8") as f:
+        state = json.load(f)
+    if state.get("version") != FORMAT_VERSION:
+        raise ValueError(f"unsupported checkpoint file format version {state.get('version')!r}, expected {FORMAT_VERSION!r}: {file}")
+    return state
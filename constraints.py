@@ -0,0 +1,434 @@
+from itertools import chain
+from math import inf
+
+import lengths
+import unique as unique_automaton
+from charsets import charset
+from unbounded import repeat
+
+# generation of only the strings matching some constraints, pruning the subtrees that can't match them
+# bounds of a node are (min length, max length, charset of the first characters, smallest first character, biggest first character)
+# or None when the node generates nothing
+EMPTY = (0, 0, charset(), None, None)
+
+
+def concat(a, b):
+    # bounds of a followed by b
+    if a is None or b is None:
+        return None
+    first = a[2] if a[0] > 0 else a[2] | b[2]
+    return (a[0] + b[0], a[1] + b[1], first, first.lowest(), first.highest())
+
+
+def union(a, b):
+    # bounds of a or b
+    if a is None:
+        return b
+    if b is None:
+        return a
+    first = a[2] | b[2]
+    return (min(a[0], b[0]), max(a[1], b[1]), first, first.lowest(), first.highest())
+
+
+def str_bounds(s):
+    return (len(s), len(s), charset(s[:1]), s[:1] or None, s[:1] or None)
+
+
+def charset_bounds(c):
+    if len(c) == 0:
+        return None
+    first = c.copy(optional=False)
+    return (0 if c.optional else 1, 1 if len(first) > 0 else 0, first, first.lowest(), first.highest())
+
+
+class bounds_index:
+    def __init__(self, options):
+        self.options = options  # keep a reference so that the node ids stay valid
+        self.ands = dict()  # id(and node) -> suffix bounds, ands[id][i] is the bounds of options[i:]
+        self.ors = dict()  # id(or node) -> bounds
+        self.total = self.and_bounds(options)
+
+    def and_bounds(self, options, i=0):
+        if isinstance(options, str):
+            return str_bounds(options)
+        suffixes = self.ands.get(id(options))
+        if suffixes is None:
+            if len(options) == 0:
+                suffixes = [None]  # an empty and generates nothing
+            else:
+                suffixes = [EMPTY]
+                for o in reversed(options):
+                    suffixes.append(concat(self.or_bounds(o), suffixes[-1]))
+                suffixes.reverse()
+            self.ands[id(options)] = suffixes
+        return suffixes[i]
+
+    def or_bounds(self, options):
+        if isinstance(options, str):
+            return str_bounds(options)
+        b = self.ors.get(id(options))
+        if b is None and id(options) not in self.ors:
+            if isinstance(options, repeat):
+                return self.repeat_bounds(options)
+            if isinstance(options, charset):
+                b = charset_bounds(options)
+            else:
+                for o in options:
+                    b = union(b, self.and_bounds(o))
+            self.ors[id(options)] = b
+        return b
+
+    def repeat_bounds(self, options):
+        # the levels from the innermost one, each generates the option followed by the next level, or nothing
+        links = []
+        while isinstance(options, repeat) and id(options) not in self.ors:
+            links.append(options)
+            options = options.rest
+        below = self.or_bounds(options)
+        for link in reversed(links):
+            b = concat(self.or_bounds(link.option), below)
+            self.ands[id(link[0])] = [b, below, EMPTY]
+            below = self.ors[id(link)] = union(b, str_bounds(""))
+        return below
+
+
+# min_len and max_len are inclusive, the strings start with prefix and lower <= string < upper
+class constrained:
+    def __init__(self, options, min_len=None, max_len=None, prefix=None, lower=None, upper=None):
+        self.options = options
+        self.min_len = 0 if min_len is None else min_len
+        self.max_len = max_len
+        self.prefix = "" if prefix is None else prefix
+        self.lower = lower
+        self.upper = upper
+        self.index = None  # built by gen(), accepts() does not need it
+
+    def accepts(self, s):
+        return (
+            self.min_len <= len(s)
+            and (self.max_len is None or len(s) <= self.max_len)
+            and s.startswith(self.prefix)
+            and (self.lower is None or self.lower <= s)
+            and (self.upper is None or s < self.upper)
+        )
+
+    def viable(self, g):
+        # whether some string starting with g can still match
+        n = min(len(g), len(self.prefix))
+        if g[:n] != self.prefix[:n]:
+            return False
+        if self.max_len is not None and len(g) > self.max_len:
+            return False
+        if self.lower is not None:
+            n = min(len(g), len(self.lower))
+            if g[:n] < self.lower[:n]:
+                return False
+        if self.upper is not None:
+            n = min(len(g), len(self.upper))
+            if g[:n] > self.upper[:n] or (n == len(self.upper) and g[:n] == self.upper):
+                return False
+        return True
+
+    def states(self):
+        # the number of states of an automaton telling whether a string starts with prefix and is within lower and
+        # upper: the characters read of the longest of them, whether they are still equal to lower and to upper,
+        # and once decided whether it matches
+        longest = max(len(s) for s in (self.prefix, self.lower, self.upper) if s is not None)
+        return 4 * (longest + 2) + 2
+
+    def next_chars(self, g):
+        # the next characters of the prefix, lower and upper when g starts them
+        n = len(g)
+        return {s[n] for s in (self.prefix, self.lower, self.upper) if s is not None and n < len(s) and s.startswith(g)}
+
+    def char_bounds(self, g):
+        # the (first, last) codepoints a character after g can have, both included, when the prefix is over: the ones
+        # strictly between them match whatever comes after
+        n = len(g)
+        first = ord(self.lower[n]) if self.lower is not None and n < len(self.lower) and self.lower.startswith(g) else 0
+        last = ord(self.upper[n]) if self.upper is not None and n < len(self.upper) and self.upper.startswith(g) else 0x10FFFF
+        return first, last
+
+    def viable_chars(self, chars, g):
+        # the strings of a charset that can follow g, only the one of the prefix when it is not over yet, otherwise the
+        # ranges of the charset cut to the bounds, only the characters at the bounds are checked
+        if len(g) < len(self.prefix):
+            return (c for c in (self.prefix[len(g)], "") if c in chars and self.viable(g + c))
+        first, last = self.char_bounds(g)
+        if self.max_len is not None and len(g) >= self.max_len:
+            first, last = 1, 0
+        viable = (c for c in chars.between(first, last) if first < ord(c) < last or self.viable(g + c))
+        return chain(viable, ("",)) if chars.optional and self.viable(g) else viable
+
+    def fits(self, g, b, rest_min, rest_max):
+        # whether g followed by a string of bounds b and something of length between rest_min and rest_max can match
+        if b is None:
+            return False
+        if self.max_len is not None and len(g) + b[0] + rest_min > self.max_len:
+            return False
+        if len(g) + b[1] + rest_max < self.min_len:
+            return False
+        if b[0] > 0:  # the next character is one of the first ones of b
+            n = len(g)
+            if n < len(self.prefix) and self.prefix[n] not in b[2]:
+                return False
+            if self.lower is not None and n < len(self.lower) and b[4] < self.lower[n] and g == self.lower[:n]:
+                return False
+            if self.upper is not None and n < len(self.upper) and b[3] > self.upper[n] and g == self.upper[:n]:
+                return False
+        return True
+
+    # same as r_and_gen and r_or_gen, what follows the node is between rest_min and rest_max characters long
+    def and_gen(self, options, i=0, generated="", rest_min=0, rest_max=0):
+        if isinstance(options, str):
+            if self.viable(generated + options):
+                yield generated + options
+            return
+        if i >= len(options):
+            if i > 0:
+                yield generated
+            return
+        suffixes = self.index.ands[id(options)]
+        if suffixes[i + 1] is None:
+            return
+        # the odometer of gen.and_strings(), stack[j] yields the strings of options[i + j] that fit what follows it
+        last = len(options) - 1
+        stack = [self.head_gen(options[i], generated, suffixes[i + 1], rest_min, rest_max)]
+        while stack:
+            g = next(stack[-1], None)
+            if g is None:
+                stack.pop()
+            elif i + len(stack) <= last:
+                stack.append(self.head_gen(options[i + len(stack)], g, suffixes[i + len(stack) + 1], rest_min, rest_max))
+            else:
+                yield g
+
+    def head_gen(self, options, generated, after, rest_min, rest_max):
+        # the strings of the or node options followed by a string of bounds after and rest_min to rest_max characters
+        for o in self.or_gen(options, generated, rest_min + after[0], rest_max + after[1]):
+            if self.fits(o, after, rest_min, rest_max):
+                yield o
+
+    def or_gen(self, options, generated="", rest_min=0, rest_max=0):
+        if isinstance(options, str):
+            if self.viable(generated + options):
+                yield generated + options
+            return
+        if isinstance(options, charset):
+            yield from (generated + o for o in self.viable_chars(options, generated))
+            return
+        if isinstance(options, repeat):
+            yield from self.repeat_gen(options, generated, rest_min, rest_max)
+            return
+        for o in options:
+            if isinstance(o, str):
+                if self.viable(generated + o):
+                    yield generated + o
+            elif self.fits(generated, self.index.and_bounds(o), rest_min, rest_max):
+                yield from self.and_gen(o, generated=generated, rest_min=rest_min, rest_max=rest_max)
+
+    def repeat_gen(self, options, generated, rest_min, rest_max):
+        # the levels of a repeat as or_gen() and and_gen() would walk them, like gen.repeat_strings(): stack[j]
+        # yields the strings of the option after the j ones before, with the next level and the string the level was
+        # given, which it yields last. The strings of the levels below the first one end the and nodes of the levels
+        # above, they fit nothing more
+        stack = []
+        while True:
+            if isinstance(options, repeat) and self.fits(generated, self.index.and_bounds(options[0]), rest_min, rest_max):
+                stack.append((self.head_gen(options.option, generated, self.index.or_bounds(options.rest), rest_min, rest_max), options.rest, generated))
+            elif self.viable(generated) and (len(stack) == 0 or self.fits(generated, EMPTY, rest_min, rest_max)):
+                yield generated
+            while stack:
+                strings, rest, prefix = stack[-1]
+                g = next(strings, None)
+                if g is None:
+                    stack.pop()
+                    if self.viable(prefix) and (len(stack) == 0 or self.fits(prefix, EMPTY, rest_min, rest_max)):
+                        yield prefix
+                    continue
+                options, generated = rest, g
+                break
+            else:
+                return
+
+    def pending(self, g):
+        # whether g is a proper prefix of the prefix, lower or upper, the characters after it decide whether it matches
+        return any(len(g) < len(s) and s.startswith(g) for s in (self.prefix, self.lower, self.upper) if s is not None)
+
+    # number of strings gen() generates, or of distinct ones with unique, without generating them: once what a
+    # string starts with decides the constraints only its length matters and the strings are counted by length,
+    # the strings still pending are followed one node, or one character of a charset, at a time
+    def count(self, unique=False):
+        if unique:
+            return self.unique_count()
+        self.index = bounds_index(self.options)
+        if not self.viable("") or not self.fits("", self.index.total, 0, 0):
+            return 0
+        self.lengths = lengths.length_index(self.options, max_len=self.max_len)
+        self.counts = dict()  # (id(node), pending string) -> (pending strings -> count, histogram of the rest)
+        pending, histogram = self.and_count(self.options, "")
+        return sum(n for g, n in pending.items() if self.accepts(g)) + sum(n for length, n in histogram.items() if self.min_len <= length)
+
+    def decided(self, histogram, generated):
+        # the histogram of the rest of the strings after generated once it decides the constraints
+        if self.max_len is None:
+            return histogram
+        return {length: n for length, n in histogram.items() if len(generated) + length <= self.max_len}
+
+    def str_count(self, s, generated):
+        g = generated + s
+        if not self.viable(g):
+            return dict(), dict()
+        return ({g: 1}, dict()) if self.pending(g) else (dict(), {len(s): 1})
+
+    # the (pending strings -> count, histogram of the lengths of the decided ones) of a node after generated,
+    # a viable string, the pending strings include generated
+    def and_count(self, options, generated):
+        if isinstance(options, str):
+            return self.str_count(options, generated)
+        if not self.pending(generated):
+            return dict(), self.decided(self.lengths.and_histogram(options), generated)
+        counted = self.counts.get((id(options), generated))
+        if counted is None:
+            counted = self.counts[id(options), generated] = self.and_counted(options, generated)
+        return counted
+
+    def or_count(self, options, generated):
+        if isinstance(options, str):
+            return self.str_count(options, generated)
+        if not self.pending(generated):
+            return dict(), self.decided(self.lengths.or_histogram(options), generated)
+        counted = self.counts.get((id(options), generated))
+        if counted is None:
+            if isinstance(options, charset):
+                counted = self.charset_count(options, generated)
+            elif isinstance(options, repeat):
+                counted = self.repeat_count(options, generated)
+            else:
+                counted = dict(), dict()
+                for o in options:
+                    if isinstance(o, str) or self.fits(generated, self.index.and_bounds(o), 0, inf):
+                        add(counted, self.and_count(o, generated))
+            self.counts[id(options), generated] = counted
+        return counted
+
+    def and_counted(self, options, generated):
+        if len(options) == 0:
+            return dict(), dict()  # an empty and generates nothing
+        cap = None if self.max_len is None else self.max_len - len(generated)
+        suffixes = self.lengths.ands[id(options)]
+        pending, histogram = {generated: 1}, dict()
+        for i, o in enumerate(options):
+            if len(pending) == 0:
+                break
+            histogram = lengths.convolve(histogram, self.lengths.or_histogram(o), cap)
+            followed = dict(), histogram
+            for g, n in pending.items():
+                add(followed, self.or_count(o, g), n, len(g) - len(generated))
+            pending = followed[0]
+        else:
+            return pending, histogram
+        return pending, lengths.convolve(histogram, suffixes[i], cap)
+
+    def charset_count(self, options, generated):
+        counted = dict(), dict()
+        n = len(generated)
+        nexts = self.next_chars(generated)
+        for c in nexts:
+            if c in options:
+                add(counted, self.str_count(c, generated))
+        if options.optional:
+            add(counted, self.str_count("", generated))
+        # the other characters decide the constraints, the ones between the bounds match
+        if n >= len(self.prefix) and (self.max_len is None or n < self.max_len):
+            first, last = self.char_bounds(generated)
+            k = options.count_range(first, last) - sum(1 for c in nexts if first <= ord(c) <= last and c in options)
+            if k > 0:
+                counted[1][1] = counted[1].get(1, 0) + k
+        return counted
+
+    def repeat_count(self, options, generated):
+        # the levels one after the other, the strings pending after the option of a level go on with the next one
+        counted = dict(), dict()
+        cap = None if self.max_len is None else self.max_len - len(generated)
+        level = {generated: 1}  # pending strings starting a level
+        while len(level) > 0:
+            add(counted, (level, dict()))  # the empty string of the level
+            if not isinstance(options, repeat):
+                break  # the innermost level, [""]
+            after = self.lengths.or_histogram(options.rest)
+            following = dict(), dict()
+            for g, n in level.items():
+                add(following, self.or_count(options.option, g), n, len(g) - len(generated))
+            add(counted, (dict(), lengths.convolve(following[1], after, cap)))
+            level, options = following[0], options.rest
+        return counted
+
+    def unique_count(self):
+        # count() over the deterministic automaton, whose states tell what follows the strings
+        automaton = unique_automaton.dfa(self.options)
+        histograms = automaton.histograms(self.max_len)
+        matched = dict()  # (state, n) -> strings from the state that have the right length after n characters
+
+        def matching(state, n):
+            k = matched.get((state, n))
+            if k is None:
+                k = matched[state, n] = sum(k for length, k in histograms[state].items() if self.min_len <= n + length and (self.max_len is None or n + length <= self.max_len))
+            return k
+
+        if not self.viable(""):
+            return 0
+        if not self.pending(""):
+            return matching(automaton.start, 0)
+        counts = dict()  # (state, pending string) -> count
+        stack = [(automaton.start, "")]
+        while stack:
+            state, g = stack[-1]
+            if (state, g) in counts:
+                stack.pop()
+                continue
+            # the next characters of the constraints one at a time, the others of each range between the bounds together
+            nexts = self.next_chars(g)
+            first, last = self.char_bounds(g)
+            follow = []
+            k = int(automaton.accepting(state) and self.accepts(g))
+            for start, end, n in automaton.next(state):
+                for c in nexts:
+                    if start <= ord(c) <= end and self.viable(g + c):
+                        if self.pending(g + c):
+                            follow.append((n, g + c))
+                        else:
+                            k += matching(n, len(g) + 1)
+                if len(g) >= len(self.prefix):
+                    start, end = max(start, first), min(end, last)
+                    others = end - start + 1 - sum(1 for c in nexts if start <= ord(c) <= end)
+                    if others > 0:
+                        k += others * matching(n, len(g) + 1)
+            todo = [key for key in follow if key not in counts]
+            if len(todo) > 0:
+                stack.extend(todo)
+                continue
+            counts[state, g] = k + sum(counts[key] for key in follow)
+            stack.pop()
+        return counts[automaton.start, ""]
+
+    def gen(self):
+        self.index = bounds_index(self.options)
+        if not self.fits("", self.index.total, 0, 0):
+            return
+        for g in self.and_gen(self.options):
+            if self.accepts(g):
+                yield g
+
+
+def add(counted, other, n=1, used=0):
+    # adds n times other to counted, (pending strings -> count, histogram), the strings of the histogram of other
+    # coming after used characters
+    for g, k in other[0].items():
+        counted[0][g] = counted[0].get(g, 0) + n * k
+    for length, k in other[1].items():
+        counted[1][used + length] = counted[1].get(used + length, 0) + n * k
+
+
+def gen(options, min_len=None, max_len=None, prefix=None, lower=None, upper=None):
+    return constrained(options, min_len, max_len, prefix, lower, upper).gen()
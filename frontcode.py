@@ -0,0 +1,80 @@
+import unbounded
+from gen import gen, r_and_gen
+
+# front coding: each string with the length of the prefix it shares with the previous one, so that the consumers
+# hashing or testing the strings incrementally redo only the work of the rest, and only the rest is written
+
+
+def diffs(options, **kwargs):
+    # (shared, string) pairs of the strings of gen(options, **kwargs), the first string shares nothing
+    walked = kwargs.get("backend", "recursive") == "recursive" and kwargs.get("order", "rule") == "rule"
+    if walked and all(v is None or v is False for k, v in kwargs.items() if k not in ("backend", "order")) and not unbounded.unbounded(options):
+        # the walk knows which prefix stays the same, only the characters after it are compared
+        return extended(walked_diffs(options))
+    return shared(gen(options, **kwargs))
+
+
+def shared(strings):
+    # (shared, string) pairs of any strings
+    return extended((0, s) for s in strings)
+
+
+def extended(pairs):
+    # the exact shared length of each string, from a lower bound of it
+    previous = ""
+    for k, s in pairs:
+        if s[k : k + 1] == previous[k : k + 1] != "":  # seldom, the bound is most often exact
+            n = min(len(s), len(previous))
+            while k < n and s[k] == previous[k]:
+                k += 1
+        yield k, s
+        previous = s
+
+
+def walked_diffs(options):
+    # (shared, string) pairs of the walk of gen(), with a lower bound of the length shared with the previous string:
+    # an or node yielding again shares at least the prefix it was given, as the walk did not move in the nodes before
+    # it, and nodes only yield again when an or node inside them does
+    shared = 0
+
+    def advancing(n, strings):
+        nonlocal shared
+        strings = iter(strings)
+        for g in strings:
+            yield g
+            break
+        for g in strings:
+            if n < shared:
+                shared = n
+            yield g
+
+    def hook(kind, node, generated, strings):
+        if kind == "and" or (len(node) == 1 and not isinstance(node[0], str)):
+            return strings
+        return advancing(len(generated), strings)
+
+    for g in r_and_gen(options, hook=hook):
+        yield shared, g
+        shared = len(g)
+
+
+def encode(pairs):
+    # a string as long as the previous one is written as the characters it changes at the end of it, the others
+    # as f"{shared}\t{rest}", \w{6} takes 2 bytes per string instead of 7
+    n = 0
+    for k, s in pairs:
+        rest = s[k:]
+        yield rest if len(s) == n and "\t" not in rest else f"{k}\t{rest}"
+        n = len(s)
+
+
+def decode(lines):
+    # the strings back from the lines of encode()
+    previous = ""
+    for line in lines:
+        if "\t" in line:
+            k, rest = line.split("\t", 1)
+            previous = previous[: int(k)] + rest
+        else:
+            previous = previous[: len(previous) - len(line)] + line
+        yield previous
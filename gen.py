@@ -1,59 +1,40 @@
 import enum
-import logging
 import sys
-from copy import deepcopy
+from bisect import bisect_right
+from itertools import islice
+
+import charsets
+import constraints
+import lengths
+import odometer
+import unbounded
+import unique as unique_automaton
+from charsets import LIST_LIMIT, charset
+from escapes import escapes
+from unbounded import repeat, star
 
-from escapes import ascii_printable, escapes
-
-logger = logging.getLogger(__name__)
 logging_format = "%(levelname)s:%(filename)s:%(funcName)s:%(message)s"
-logging.basicConfig(encoding="utf-8", format=logging_format, level=logging.DEBUG)
-
 
-class stable_set:
-    def __init__(self, *args):
-        self.__dict = dict()
-        # self.__count = 0
-        # self.__dirty_count = False
-        for c in args:
-            self.add(c)
 
-    def add(self, c):
-        if len(c) <= 1:
-            self.__dict[c] = None  # self.__count
-            # self.__count += 1
-        else:
-            for cc in c:
-                self.__dict[cc] = None  # self.__count
-                # self.__count += 1
+class quiet_logger:
+    # stands for the logger until enable_logging(), so that importing gen does not import logging
+    def debug(self, *args, **kwargs):
+        pass
 
-    def remove(self, c):
-        self.__dict.pop(c)
-        # self.__dirty_count = True  # lazy index update
-        # self.__count -= 1
+    info = warning = debug
 
-    def __len__(self):
-        return len(self.__dict)
-
-    def __iter__(self):
-        return iter(self.__dict)
 
-    def __contains__(self, c):
-        return c in self.__dict
+logger = quiet_logger()
 
-    # def __recount(self):
-    #     self.__count = 0
-    #     for c in self.__dict:
-    #         self.__dict[c] = self.__count
-    #         self.__count += 1
 
-    # def index(self, c):
-    #     if self.__dirty_count:  # lazy index update
-    #         self.__recount()
-    #     return self.__dict[c]
+def enable_logging(level=None):
+    # log through the logging module from now on, with a level the root logger is also configured to show the logs
+    global logger
+    import logging
 
-    def __repr__(self):
-        return "<" + repr(list(self.__dict))[1:-1] + ">"
+    if level is not None:
+        logging.basicConfig(encoding="utf-8", format=logging_format, level=level)
+    logger = logging.getLogger(__name__)
 
 
 class State(enum.IntEnum):
@@ -73,9 +54,7 @@ def read_hex(rule, i=0, n=2):
             raise SyntaxError(f"Invalid spec, end of spec while still processing an open {State.ESCAPE.name} at index {i-1}: {rule[i-1]!r}\n\t{rule}\n\t{'~' * (i-1)}^")
         match rule[i]:
             case "0" | "1" | "2" | "3" | "4" | "5" | "6" | "7" | "8" | "9" | "a" | "b" | "c" | "d" | "e" | "f" | "A" | "B" | "C" | "D" | "E" | "F":
-                logger.debug("case %r", rule[i])
                 values += rule[i]
-                logger.debug("values %r", values)
             case _:
                 raise SyntaxError(f"Invalid hexadecimal escape sequence, invalid hexadecimal character at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
     return chr(int(values, 16)), i
@@ -89,9 +68,7 @@ def read_oct(rule, i=0, n=3):
             raise SyntaxError(f"Invalid spec, end of spec while still processing an open {State.ESCAPE.name} at index {i-1}: {rule[i-1]!r}\n\t{rule}\n\t{'~' * (i-1)}^")
         match rule[i]:
             case "0" | "1" | "2" | "3" | "4" | "5" | "6" | "7":
-                logger.debug("case %r", rule[i])
                 values += rule[i]
-                logger.debug("values %r", values)
             case _:
                 raise SyntaxError(f"Invalid octal escape sequence, invalid octal character at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
     ov = int(values, 8)
@@ -100,37 +77,46 @@ def read_oct(rule, i=0, n=3):
     return chr(ov), i
 
 
-def rparse_escape(rule, i=0, states=None, options=None):
-    logger.debug("enter %r, %r, %r, %r", rule, i, states, options)
-    # skip registering state since this function does not recurse
-    if states[-1] != State.SET:
-        options.append(stable_set())  # do not create a new option if escaping inside a set
-        logger.debug("set %r %r", states[-1], State.SET)
+def read_escape(rule, i=0):
+    # value of the escape sequence at rule[i], a string or a charset of the alphabet for the negative class escapes
     if i >= len(rule):
         logger.debug("SystaxError unclosed %r", State.ESCAPE)
         raise SyntaxError(f"Invalid spec, end of spec while still processing an open {State.ESCAPE.name} at index {i-1}: {rule[i-1]!r}\n\t{rule}\n\t{'~' * (i-1)}^")
-    logger.debug("case %r", rule[i])
+    if rule[i] in "DSW":
+        return charsets.alphabet.difference(charset(escapes[rule[i].lower()])), i
     if rule[i] in escapes:
-        l = escapes[rule[i]]
-    else:
-        match rule[i]:
-            case "x":
-                l, i = read_hex(rule, i=i + 1, n=2)
-            case "o":
-                l, i = read_oct(rule, i=i + 1, n=3)
-            case "u":
-                l, i = read_hex(rule, i=i + 1, n=4)
-            case "U":
-                l, i = read_hex(rule, i=i + 1, n=8)
-            case _:
-                l = rule[i]
-    logger.debug("l %r", l)
+        return escapes[rule[i]], i
+    match rule[i]:
+        case "x":
+            return read_hex(rule, i=i + 1, n=2)
+        case "o":
+            return read_oct(rule, i=i + 1, n=3)
+        case "u":
+            return read_hex(rule, i=i + 1, n=4)
+        case "U":
+            return read_hex(rule, i=i + 1, n=8)
+        case _:
+            return rule[i], i
+
+
+def rparse_escape(rule, i=0, states=None, options=None):
+    logger.debug("enter %r, %r, %r, %r", rule, i, states, options)
+    # skip registering state since this function does not recurse
+    if states[-1] != State.SET:
+        options.append(charset())  # do not create a new option if escaping inside a set
+    l, i = read_escape(rule, i)
     options[-1].add(l)
-    logger.debug("options %r", options[-1])
     logger.debug("return %r, %r", i, options)
     return i, options
 
 
+def read_set_item(rule, i=0):
+    # a character of a set, or a class escape, and the index of its last character
+    if rule[i] == "\\":
+        return read_escape(rule, i + 1)
+    return rule[i], i
+
+
 def rparse_set(rule, i=0, states=None, options=None):
     logger.debug("se_setenter %r, %r, %r, %r", rule, i, states, options)
     negative_group = False
@@ -138,60 +124,48 @@ def rparse_set(rule, i=0, states=None, options=None):
         logger.debug("SystaxError unclosed %r", State.SET)
         raise SyntaxError(f"Invalid spec, end of spec while still processing an open {State.SET.name} at index {i-1}: {rule[i-1]!r}\n\t{rule}\n\t{'~' * (i-1)}^")
     if rule[i] == "^":
-        logger.debug("negative %r", rule[i])
         negative_group = True
         i += 1
         if i >= len(rule):
             logger.debug("SystaxError unclosed %r", State.SET)
             raise SyntaxError(f"Invalid spec, end of spec while still processing an open {State.SET.name} at index {i-1}: {rule[i-1]!r}\n\t{rule}\n\t{'~' * (i-1)}^")
-    if not negative_group:
-        options.append(stable_set())
-    else:
-        options.append(stable_set(ascii_printable))
-    logger.debug("options %r", options[-1])
+    options.append(charset())  # the characters of a negative set are removed from the alphabet once it is closed
     while i < len(rule):
         match rule[i]:
             case "]":  # end set
-                logger.debug("case %r", rule[i])
-                logger.debug("options %r", options[-1])
+                if negative_group:
+                    options[-1] = charsets.alphabet.difference(options[-1])
                 if len(options[-1]) == 0:  # discard empty set
-                    logger.debug("options pop empty")
                     options.pop()
                 logger.debug("return %r, %r", i, options)
                 return i, options
-            case "\\":  # escape sequence in set
-                logger.debug("case %r", rule[i])
-                states.append(State.SET)
-                i, options = rparse_escape(rule, i=i + 1, states=states, options=options)
-                states.pop()
-            case _:  # set opening char is allowed in set as a normal char
-                logger.debug("case %r", rule[i])
-                if not negative_group:
-                    options[-1].add(rule[i])
+            case _:  # set opening char is allowed in set as a normal char, escape sequences too
+                first, i = read_set_item(rule, i)
+                if i + 2 < len(rule) and rule[i + 1] == "-" and rule[i + 2] != "]":  # range, a - first or last is a normal char
+                    last, i = read_set_item(rule, i + 2)
+                    if not (isinstance(first, str) and len(first) == 1 and isinstance(last, str) and len(last) == 1):
+                        raise SyntaxError(f"Invalid set range, a class escape can not be a range bound at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
+                    if first > last:
+                        raise SyntaxError(f"Invalid set range, the range bounds are out of order ({first!r} > {last!r}) at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
+                    options[-1].add_range(ord(first), ord(last))
                 else:
-                    options[-1].remove(rule[i])
-                logger.debug("options %r", options[-1])
+                    options[-1].add(first)
         i += 1
     logger.debug("SystaxError unclosed %r", State.SET)
     raise SyntaxError(f"Invalid spec, end of spec while still processing an open {State.SET.name} at index {i-1}: {rule[i-1]!r}\n\t{rule}\n\t{'~' * (i-1)}^")
 
 
-def rparse__count(rule, i=0, states=None, options=None):
-    logger.debug("enter %r, %r, %r, %r", rule, i, states, options)
-    # skip registering state since this function does not recurse
+def read_count(rule, i=0):
     count_values = [""]
     while i < len(rule):
         match rule[i]:
             case "0" | "1" | "2" | "3" | "4" | "5" | "6" | "7" | "8" | "9":
-                logger.debug("case %r", rule[i])
                 count_values[-1] += rule[i]
             case ",":  # next count argument
-                logger.debug("case %r", rule[i])
                 if len(count_values) >= 2:  # count only allows a max of 2 arguments
                     raise SyntaxError(f"Invalid count, too many count arguments at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
                 count_values.append("")
             case "}":  # end count
-                logger.debug("case %r", rule[i])
                 assert 1 <= len(count_values) <= 2  # count only allows 1 or 2 arguments
                 if len(count_values) == 1:  # count with one argument
                     if len(count_values[0]) == 0:  # if no argument was given
@@ -199,40 +173,61 @@ def rparse__count(rule, i=0, states=None, options=None):
                     max = int(count_values[0])
                     min = max
                 else:  # count with two arguments
-                    if len(count_values[1]) == 0:  # first argument is infinity by default if not given, but we can't do that
-                        raise SyntaxError(f"Invalid count, even if regex allows unlimited count max it's not possible to handle it for generation, error at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
                     if len(count_values[0]) == 0:  # first argument is zero by default if not given
                         count_values[0] = 0
-                    min, max = int(count_values[0]), int(count_values[1])
-                if min > max:  # the first count argument must be less than the second
-                    raise SyntaxError(f"Invalid count, the first count argument must be less than the second at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
-                if max == 0:
-                    logger.debug("options pop empty")
-                    options.pop()  # discard empty count
-                else:
-                    # TODO: generate differently to remove duplicates (ex.: 'a', 'a' on "a?a?")
-                    # TODO: generate differently to remove duplication of already optionals (ex.: '', '' on "a??")
-                    options.append([[options.pop()]])
-                    if min > 0:
-                        for _ in range(1, min):
-                            options[-1][-1].append(options[-1][-1][-1])
-                        if max > 1 and max > min:
-                            options[-1][-1].append(deepcopy(options[-1][-1][-1]))
-                            options[-1][-1][-1].add("")
+                    if len(count_values[1]) == 0:  # second argument is infinity by default if not given
+                        min, max = int(count_values[0]), None
                     else:
-                        options[-1][-1][-1].add("")
-                    for _ in range(min + 1, max):
-                        options[-1][-1].append(options[-1][-1][-1])
-                logger.debug("return %r, %r", i, options)
-                return i, options
+                        min, max = int(count_values[0]), int(count_values[1])
+                if max is not None and min > max:  # the first count argument must be less than the second
+                    raise SyntaxError(f"Invalid count, the first count argument must be less than the second at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
+                return min, max, i
             case _:
-                logger.debug("case %r", rule[i])
                 raise SyntaxError(f"Invalid count, invalid argument character at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
         i += 1
     logger.debug("SystaxError unclosed %r", State.COUNT)
     raise SyntaxError(f"Invalid spec, end of spec while still processing an open {State.COUNT.name} at index {i-1}: {rule[i-1]!r}\n\t{rule}\n\t{'~' * (i-1)}^")
 
 
+def optional(option):
+    # a new option that also generates the empty string, sharing the unchanged parts
+    if isinstance(option, charset):
+        return option.copy(optional=True)
+    return option + [""]
+
+
+def repeated(option, min):
+    # option at least min times, without maximum, a large set is kept whole as the only alternative
+    if isinstance(option, charset) and len(option) > LIST_LIMIT:
+        return [[option] * min + [star([[option]])]]
+    return [[option] * min + [star(option)]]
+
+
+def rparse__count(rule, i=0, states=None, options=None):
+    logger.debug("enter %r, %r, %r, %r", rule, i, states, options)
+    # skip registering state since this function does not recurse
+    min, max, i = read_count(rule, i)
+    if max is None:
+        options.append(repeated(options.pop(), min))
+    elif max == 0:
+        options.pop()  # discard empty count
+    else:
+        # TODO: generate differently to remove duplicates (ex.: 'a', 'a' on "a?a?")
+        # TODO: generate differently to remove duplication of already optionals (ex.: '', '' on "a??")
+        options.append([[options.pop()]])
+        if min > 0:
+            for _ in range(1, min):
+                options[-1][-1].append(options[-1][-1][-1])
+            if max > 1 and max > min:
+                options[-1][-1].append(optional(options[-1][-1][-1]))
+        else:
+            options[-1][-1][-1] = optional(options[-1][-1][-1])
+        for _ in range(min + 1, max):
+            options[-1][-1].append(options[-1][-1][-1])
+    logger.debug("return %r, %r", i, options)
+    return i, options
+
+
 def rparse(rule, i=0, states=None, options=None):
     if options is None:
         options = []
@@ -245,8 +240,11 @@ def rparse(rule, i=0, states=None, options=None):
                 i, options = rparse_escape(rule, i=i + 1, states=states, options=options)
             case "[":  # new set
                 i, options = rparse_set(rule, i=i + 1, states=states, options=options)
-            case "*" | "+":
-                raise SyntaxError(f"Invalid count, even if regex allows unlimited count max it's not possible to handle it for generation, error at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
+            case "*" | "+":  # new unbounded count (same as count 0- and 1-)
+                if len(options) > 0:
+                    options.append(repeated(options.pop(), 0 if rule[i] == "*" else 1))
+                else:
+                    print(f"repetition modifier character {rule[i]!r} applied to nothing, ignoring it, warning at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^", file=sys.stderr)
             case "?":  # new optional (same as count 0-1)
                 if len(options) > 0:
                     options.append([[options.pop()], ""])
@@ -283,8 +281,7 @@ def rparse(rule, i=0, states=None, options=None):
                 # logger.warning(f"boundary assertion character {rule[i]!r} is valid in regex  but does not make sense here, ignoring it, warning at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^")
                 print(f"boundary assertion character {rule[i]!r} is valid in regex  but does not make sense here, ignoring it, warning at index {i}: {rule[i]!r}\n\t{rule}\n\t{'~' * i}^", file=sys.stderr)
             case _:  # normal char
-                options.append(stable_set())
-                options[-1].add(rule[i])
+                options.append(charset(rule[i]))
         i += 1
     if states[-1] != State.NONE and states[-1] != State.OR:
         logger.debug("SystaxError unclosed %r", states[-1])
@@ -294,8 +291,21 @@ def rparse(rule, i=0, states=None, options=None):
     return options, i
 
 
-def rmap(f, it):
-    return (f(rmap(f, x)) if not isinstance(x, str) else x for x in it)
+def rmap(f, it, done=None):
+    # the large sets stay charsets, the walkers index them by their ranges, a node met several times, like the
+    # repetitions of a count, is mapped once and stays shared
+    if done is None:
+        done = dict()  # id(node) -> mapped node
+    return (rmap_node(f, x, done) for x in it)
+
+
+def rmap_node(f, x, done):
+    if isinstance(x, str) or isinstance(x, charset) and len(x) > LIST_LIMIT:
+        return x
+    mapped = done.get(id(x))
+    if mapped is None:
+        mapped = done[id(x)] = star(rmap(f, x, done)) if isinstance(x, star) else f(rmap(f, x, done))
+    return mapped
 
 
 def parse(rule, i=0, states=None, options=None):
@@ -306,40 +316,373 @@ def parse(rule, i=0, states=None, options=None):
     return p
 
 
-def r_or_gen(options, generated=""):
-    logger.debug("in %r, %r", options, generated)
+# the walk of gen(): each alternative of an or node after the other, and the product of the or nodes of an and node,
+# the last one varying fastest. hook(kind, node, generated, strings), when given, wraps the strings of each list node,
+# the ones starting with generated, kind is "and" or "or", for the walks observing them (stats, frontcode)
+def r_or_gen(options, generated="", hook=None):
     if isinstance(options, str):
-        logger.debug("yeld str %r, %r, %r", options, generated, generated + options)
-        yield generated + options
-        return
-    for o in options:
-        for g in r_and_gen(o, generated=generated):
-            logger.debug("yeld g %r, %r, %r", options, generated, g)
-            yield g
-    logger.debug("return %r, %r", options, generated)
+        return iter((generated + options,))
+    strings = repeat_strings(options, generated, hook) if isinstance(options, repeat) else or_strings(options, generated, hook)
+    return strings if hook is None else hook("or", options, generated, strings)
 
 
-def r_and_gen(options, i=0, generated=""):
-    logger.debug("in %r, %r, %r", options, i, generated)
+def r_and_gen(options, i=0, generated="", hook=None):
     if isinstance(options, str):
-        logger.debug("yeld str %r, %r, %r, %r", options, i, generated, generated + options)
-        yield generated + options
-        return
-    if i >= len(options):
-        if i > 0:
-            logger.debug("yeld i>0 %r, %r, %r", options, i, generated)
+        return iter((generated + options,))
+    strings = and_strings(options, i, generated, hook)
+    return strings if hook is None else hook("and", options, generated, strings)
+
+
+def or_strings(options, generated, hook):
+    for o in options:
+        if isinstance(o, str):
+            yield generated + o
+        else:
+            yield from and_strings(o, 0, generated, hook) if hook is None else r_and_gen(o, generated=generated, hook=hook)
+
+
+def and_strings(options, i, generated, hook):
+    # an odometer over the or nodes after i rather than a recursion per or node, long literals are one or node per
+    # character: stack[j] yields the strings of options[i + j] after the ones generated by the previous or nodes
+    last = len(options) - 1
+    if i >= last:
+        if i == last:
+            yield from r_or_gen(options[i], generated, hook)
+        elif i > 0:
             yield generated
-        logger.debug("return i >= len(options) %r, %r, %r", options, i, generated)
         return
-    for o in r_or_gen(options[i], generated=generated):
-        for g in r_and_gen(options, i + 1, o):
-            logger.debug("yeld g %r, %r, %r", options, i, generated, g)
+    stack = [r_or_gen(options[i], generated, hook)]
+    while stack:
+        g = next(stack[-1], None)
+        if g is None:
+            stack.pop()
+        elif i + len(stack) < last:
+            stack.append(r_or_gen(options[i + len(stack)], g, hook))
+        else:
+            yield from r_or_gen(options[last], g, hook)
+
+
+def repeat_strings(options, generated, hook):
+    # the levels of a repeat as or_strings() and and_strings() would walk them, without a recursion per level:
+    # stack[j] yields the strings of the option after the j ones before, the level of prefixes[j] yields it last
+    stack = [r_or_gen(options.option, generated, hook)]
+    prefixes = [generated]
+    while stack:
+        g = next(stack[-1], None)
+        if g is None:
+            stack.pop()
+            yield prefixes.pop()
+        elif len(stack) < options.count:
+            stack.append(r_or_gen(options.option, g, hook))
+            prefixes.append(g)
+        else:
             yield g
-    logger.debug("return %r, %r, %r", options, i, generated)
 
 
-def gen(options):
+class size_index:
+    def __init__(self, options):
+        self.options = options  # keep a reference so that the node ids stay valid
+        self.ands = dict()  # id(and node) -> suffix products, ands[id][i] is the count of options[i:]
+        self.ors = dict()  # id(or node) -> prefix sums, ors[id][i] is the count of options[:i]
+        self.flat = set()  # id(or node) of the or nodes made only of strings, indexed directly
+        self.total = self.and_count(options)
+
+    def and_count(self, options):
+        if isinstance(options, str):
+            return 1
+        products = self.ands.get(id(options))
+        if products is None:
+            if len(options) == 0:
+                products = [0]  # an empty and generates nothing
+            else:
+                products = [1]
+                for o in reversed(options):
+                    products.append(products[-1] * self.or_count(o))
+                products.reverse()
+            self.ands[id(options)] = products
+        return products[0]
+
+    def or_count(self, options):
+        if isinstance(options, str):
+            return 1
+        if isinstance(options, star):
+            raise ValueError("the rule generates infinitely many strings, give a max_len")
+        sums = self.ors.get(id(options))
+        if sums is None:
+            if isinstance(options, repeat):
+                return self.repeat_count(options)
+            if isinstance(options, charset):
+                sums = [0, len(options)]  # only indexed directly
+            else:
+                sums = [0]
+                for o in options:
+                    sums.append(sums[-1] + self.and_count(o))
+            self.ors[id(options)] = sums
+            if isinstance(options, charset) or all(isinstance(o, str) for o in options):
+                self.flat.add(id(options))
+        return sums[-1]
+
+    def repeat_count(self, options):
+        # the levels from the innermost one, each generates the option followed by the next level, then the empty
+        # string: count(level) = count(option) * count(next level) + 1
+        links = []
+        while isinstance(options, repeat) and id(options) not in self.ors:
+            links.append(options)
+            options = options.rest
+        below = self.or_count(options)
+        for link in reversed(links):
+            product = self.or_count(link.option) * below
+            self.ands[id(link[0])] = [product, below, 1]
+            self.ors[id(link)] = [0, product, product + 1]
+            below = product + 1
+        return below
+
+    def and_nth(self, options, k):
+        if isinstance(options, str):
+            return options
+        products = self.ands[id(options)]
+        generated = []
+        for i, o in enumerate(options):
+            d, k = divmod(k, products[i + 1])
+            generated.append(self.or_nth(o, d))
+        return "".join(generated)
+
+    def or_nth(self, options, k):
+        if isinstance(options, str):
+            return options
+        if isinstance(options, repeat):
+            return self.repeat_nth(options, k)
+        if id(options) in self.flat:
+            return options[k]
+        sums = self.ors[id(options)]
+        j = bisect_right(sums, k) - 1  # skips over alternatives that generate nothing
+        return self.and_nth(options[j], k - sums[j])
+
+    def repeat_nth(self, options, k):
+        generated = []
+        while isinstance(options, repeat) and k < self.ors[id(options)][1]:
+            d, k = divmod(k, self.ands[id(options[0])][1])
+            generated.append(self.or_nth(options.option, d))
+            options = options.rest
+        return "".join(generated)  # k is the empty string of the level reached
+
+    # same as r_and_gen and r_or_gen but starting from the k-th generated string
+    def and_gen(self, options, k=0, i=0, generated=""):
+        if isinstance(options, str):
+            yield generated + options
+            return
+        last = len(options) - 1
+        if i >= last:
+            if i == last:
+                yield from self.or_gen(options[i], k, generated)
+            elif i > 0:
+                yield generated
+            return
+        # the odometer of and_strings(), each or node starting from its digit of k the first time
+        products = self.ands[id(options)]
+        d, k = divmod(k, products[i + 1])
+        stack = [self.or_gen(options[i], d, generated)]
+        while stack:
+            g = next(stack[-1], None)
+            if g is None:
+                stack.pop()
+                continue
+            j = i + len(stack)
+            d, k = divmod(k, products[j + 1])
+            if j < last:
+                stack.append(self.or_gen(options[j], d, g))
+            else:
+                yield from self.or_gen(options[last], d, g)
+
+    def or_gen(self, options, k=0, generated=""):
+        if isinstance(options, str):
+            yield generated + options
+            return
+        if isinstance(options, repeat):
+            yield from self.repeat_gen(options, k, generated)
+            return
+        if id(options) in self.flat:
+            for o in options.chars(k) if isinstance(options, charset) else islice(options, k, None):
+                yield generated + o
+            return
+        sums = self.ors[id(options)]
+        j = bisect_right(sums, k) - 1 if k else 0
+        k -= sums[j]
+        for o in options[j:]:
+            yield from self.and_gen(o, k, generated=generated)
+            k = 0
+
+    def repeat_gen(self, options, k, generated):
+        # repeat_strings() from the k-th string: down the levels to it, then the same loop
+        option, count = options.option, options.count
+        stack = []
+        prefixes = []
+        while isinstance(options, repeat) and k < self.ors[id(options)][1]:
+            d, k = divmod(k, self.ands[id(options[0])][1])
+            stack.append(self.or_gen(option, d, generated))
+            prefixes.append(generated)
+            generated = next(stack[-1])
+            options = options.rest
+        yield generated  # the empty string of the level reached, after the option strings taken on the way down
+        while stack:
+            g = next(stack[-1], None)
+            if g is None:
+                stack.pop()
+                yield prefixes.pop()
+            elif len(stack) < count:
+                stack.append(self.or_gen(option, 0, g))
+                prefixes.append(g)
+            else:
+                yield g
+
+
+def count(options):
+    return size_index(options).total
+
+
+def nth(options, k, index=None):
+    if index is None:
+        index = size_index(options)
+    if k < 0:
+        k += index.total
+    if not 0 <= k < index.total:
+        raise IndexError(f"generation index out of range, {k} is not in [0, {index.total})")
+    return index.and_nth(options, k)
+
+
+BACKENDS = ("recursive", "odometer", "vector")
+FILTERS = ("min_len", "max_len", "prefix", "lower", "upper")
+
+
+def gen(options, start=None, stop=None, backend="recursive", unique=False, resume_from=None, min_len=None, max_len=None, prefix=None, lower=None, upper=None, order="rule", stats=None):
+    # stats, a stats.stats, instruments the recursive walk, nothing is measured without it
     logger.debug("-" * 25)
-    for r in r_and_gen(options):
-        yield r
+    if resume_from is not None:
+        start = resume_from["index"] if isinstance(resume_from, dict) else resume_from
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown generation backend {backend!r}, expected one of {BACKENDS}")
+    if order not in lengths.ORDERS:
+        raise ValueError(f"unknown generation order {order!r}, expected one of {lengths.ORDERS}")
+    if order == "shortlex" and not unique:
+        raise ValueError("order='shortlex' generates each distinct string once, it needs unique=True")
+    filters = dict(zip(FILTERS, (min_len, max_len, prefix, lower, upper)))
+    infinite = False
+    if unbounded.unbounded(options):
+        if max_len is not None:
+            options = unbounded.expand(options, max_len)
+        elif not unbounded.infinite(options):
+            options = unbounded.expand(options, 0)
+        else:
+            infinite = True  # infinitely many strings, they can only be generated one length after the other
+    # start and stop index the strings generated with all the other arguments, whatever generates them
+    if (start is not None and start < 0) or (stop is not None and stop < 0):
+        if infinite:
+            raise ValueError("the rule generates infinitely many strings, negative indexes need a max_len")
+        start, stop, _ = slice(start, stop).indices(generated_count(options, unique=unique, order=order, **filters))
+    start = 0 if start is None else start
+    constrained = any(v is not None for v in filters.values())
+    if infinite:
+        generated = infinite_strings(options, start, order, unique, filters)
+    elif order != "rule":
+        generated = ordered_strings(options, start, order, unique, filters)
+    elif constrained:
+        generated = constrained_strings(options, start, unique, filters)
+    elif unique:
+        generated = islice(unique_automaton.gen(options), start, None)
+    else:
+        generated = backend_strings(options, start, backend, None if stop is not None else stats)
+    yield from islice(generated, None if stop is None else max(0, stop - start))
     logger.debug("-" * 25)
+
+
+# the strings of gen() from the start-th one for a rule generating infinitely many of them, gen() stops them like
+# the strings of the other functions below
+def infinite_strings(options, start, order, unique, filters):
+    order = "length" if order == "rule" else order
+    if filters["prefix"] is None and filters["lower"] is None and filters["upper"] is None:
+        return islice(unbounded.gen(options, order, unique=unique, min_len=filters["min_len"]), start, None)
+    # the rule and the constraints are an automaton of n states: if it matches infinitely many strings it matches
+    # one of n to 2n - 1 characters, otherwise none longer than n - 1 and the rule is finite once expanded for it
+    n = (unbounded.positions(options) + 1) * constraints.constrained(options, **filters).states()
+    longer = constraints.constrained(unbounded.expand(options, 2 * n - 1), **{**filters, "min_len": n, "max_len": 2 * n - 1})
+    if longer.count() == 0:
+        options, filters = unbounded.expand(options, n - 1), {**filters, "max_len": n - 1}
+        # stopped once the matching strings are all generated rather than at the end of the filtered ones
+        matching = constraints.constrained(options, **filters).count()
+        left = max(0, (matching if not unique or matching == 0 else constraints.constrained(options, **filters).count(True)) - start)
+        return islice(ordered_strings(options, start, order, unique, filters), left)
+    generated = unbounded.gen(options, order, unique=unique, min_len=filters["min_len"])
+    return islice(filter(constraints.constrained(options, **filters).accepts, generated), start, None)
+
+
+def ordered_strings(options, start, order, unique, filters):
+    # one length after the other from the start-th string, the backend is not used
+    if filters["prefix"] is None and filters["lower"] is None and filters["upper"] is None:
+        # the lengths before start are skipped without generating them
+        return lengths.gen(options, order, unique=unique, min_len=filters["min_len"], max_len=filters["max_len"], start=start)
+    generated = lengths.gen(options, order, unique=unique, min_len=filters["min_len"], max_len=filters["max_len"])
+    return islice(filter(constraints.constrained(options, **filters).accepts, generated), start, None)
+
+
+def constrained_strings(options, start, unique, filters):
+    # start indexes the strings matching the constraints, the backend is not used
+    if unique:
+        return islice(filter(constraints.constrained(options, **filters).accepts, unique_automaton.gen(options)), start, None)
+    return islice(constraints.gen(options, **filters), start, None)
+
+
+def backend_strings(options, start, backend, stats=None):
+    # the strings of the rule from the start-th one, walked by the recursive backend from the first one
+    if backend == "vector":
+        import vector  # imports numpy when available
+
+        return vector.gen(options, start=start)
+    if backend == "odometer":
+        plan = odometer.plan(options)
+        return odometer.run(plan, k=start) if start < plan[2] else iter(())
+    if start == 0:
+        return r_and_gen(options) if stats is None else stats.walk(options)
+    index = size_index(options)
+    return index.and_gen(options, start) if start < index.total else iter(())
+
+
+# number of strings gen() generates with these arguments, the other arguments of gen() are ignored
+def generated_count(options, unique=False, order="rule", **kwargs):
+    if order == "shortlex" and not unique:
+        raise ValueError("order='shortlex' generates each distinct string once, it needs unique=True")
+    filters = {k: kwargs.get(k) for k in FILTERS}
+    if unbounded.unbounded(options):
+        if filters["max_len"] is None and unbounded.infinite(options):
+            raise ValueError("the rule generates infinitely many strings, give a max_len")
+        options = unbounded.expand(options, 0 if filters["max_len"] is None else filters["max_len"])
+    if filters["prefix"] is None and filters["lower"] is None and filters["upper"] is None and not unique:
+        if filters["min_len"] is not None or filters["max_len"] is not None:
+            return lengths.length_index(options, max_len=filters["max_len"]).count(0 if filters["min_len"] is None else filters["min_len"], filters["max_len"])
+    elif any(v is not None for v in filters.values()):
+        return constraints.constrained(options, **filters).count(unique)  # by length, without generating them
+    return unique_automaton.count(options) if unique else count(options)
+
+
+# gen() keeping track of its position, its cursor can be saved and passed back as gen(options, resume_from=cursor)
+class enumeration:
+    def __init__(self, options, start=None, stop=None, resume_from=None, **kwargs):
+        if resume_from is not None:
+            start = resume_from["index"] if isinstance(resume_from, dict) else resume_from
+        if start is None:
+            start = 0
+        elif start < 0:
+            start = max(0, start + generated_count(options, **kwargs))
+        self.index = start
+        self.generated = gen(options, start=start, stop=stop, **kwargs)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        g = next(self.generated)
+        self.index += 1
+        return g
+
+    @property
+    def cursor(self):
+        return {"index": self.index}
@@ -1,14 +1,273 @@
+import argparse
+import contextlib
+import itertools
+import os
 import sys
+import time
 
-from gen import gen, parse
+import charsets
+import lengths
+from gen import BACKENDS, FILTERS, enable_logging, gen, generated_count, parse
+
+# the modules of the other features are imported when their options are used, so that the command starts fast
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="generate all the strings matching the given rules")
+    parser.add_argument("rules", nargs="*", help="the rules to generate from, use -- before rules starting with -")
+    parser.add_argument("-v", "--verbose", action="count", default=0, help="log what the parser does, -v for the rules, -vv for every step")
+    parser.add_argument("--stats", action="store_true", help="print to stderr the time spent parsing and generating, the throughput, and the nodes of the rules taking the most time with the recursive backend")
+    parser.add_argument("--self-test", action="store_true", help="run the test suite and exit")
+    parser.add_argument("--batch", metavar="FILE", default=None, help="also read rules from this file, one per line, and generate all the rules as a single merged rule, rule after rule, printing each rule and its count once it is done")
+    parser.add_argument("--count", action="store_true", help="print how many strings each rule generates instead of generating them")
+    parser.add_argument("--max-count", type=int, default=None, help="refuse rules that would generate more than this many strings")
+    parser.add_argument("--start", type=int, default=None, help="index of the first string to generate for each rule, negative values count from the end")
+    parser.add_argument("--stop", type=int, default=None, help="index after the last string to generate for each rule, negative values count from the end")
+    parser.add_argument("--min-len", type=int, metavar="N", default=None, help="only generate the strings at least N characters long")
+    parser.add_argument("--max-len", type=int, metavar="N", default=None, help="only generate the strings at most N characters long")
+    parser.add_argument("--prefix", default=None, help="only generate the strings starting with this prefix")
+    parser.add_argument("--lower", metavar="STRING", default=None, help="only generate the strings greater than or equal to STRING")
+    parser.add_argument("--upper", metavar="STRING", default=None, help="only generate the strings lower than STRING")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="generate using this many worker processes")
+    parser.add_argument("--unordered", action="store_true", help="with --jobs, output the strings in whatever order the workers complete them")
+    parser.add_argument("--backend", choices=BACKENDS, default="recursive", help="generation engine to use, all of them generate the same strings in the same order")
+    parser.add_argument("--order", choices=lengths.ORDERS, default="rule", help="order of the strings: the order of the rule, by length keeping the order of the rule within a length, or by length then lexicographically (with --unique only, each distinct string once)")
+    parser.add_argument("--alphabet", choices=tuple(charsets.ALPHABETS), default="ascii", help="characters the negated sets and the \\D \\S \\W escapes are taken from, default: %(default)s")
+    parser.add_argument("--top", type=int, metavar="K", default=None, help="generate the K most likely strings of each rule, most likely first, see --weights")
+    parser.add_argument("--min-prob", type=float, metavar="P", default=None, help="generate the strings of probability at least P of each rule, most likely first, see --weights")
+    parser.add_argument("--weights", metavar="FILE", default=None, help="json file of the weights of the characters and alternatives for --top and --min-prob, all of them weigh 1 by default")
+    parser.add_argument("-u", "--unique", action="store_true", help="generate each distinct string only once")
+    parser.add_argument("--load", metavar="FILE", help="load compiled rules from this file, rules found there are not parsed again")
+    parser.add_argument("--dump", metavar="FILE", help="save the compiled rules to this file")
+    parser.add_argument("--random", type=int, metavar="K", default=None, help="generate K uniformly random strings of each rule instead of all of them, each distinct string is equally likely, with --max-len only the ones no longer than it")
+    parser.add_argument("--seed", type=int, default=None, help="seed for --random, to get reproducible strings")
+    parser.add_argument("--multiplicity", action="store_true", help="with --random, a string the rule generates several times is that many times more likely")
+    parser.add_argument("-o", "--output", metavar="FILE", default=None, help="write the strings to this file instead of stdout")
+    parser.add_argument("--encoding", default="utf-8", help="encoding of the output, default: %(default)s")
+    parser.add_argument("-0", "--null", action="store_true", help="separate the strings with NUL characters instead of newlines")
+    parser.add_argument("--front-coded", action="store_true", help="write each string as the number of characters it shares with the previous one, a tab and the rest of it")
+    parser.add_argument("--compress", choices=("gzip", "bz2", "lzma"), default=None, help="compress the output")
+    parser.add_argument("--split-size", type=int, metavar="BYTES", default=None, help="split the output in files FILE.000, FILE.001, ... of at most this many bytes (before compression), never splitting a string")
+    parser.add_argument("--checkpoint", metavar="FILE", default=None, help="periodically save the position reached to this file")
+    parser.add_argument("--checkpoint-every", type=int, metavar="N", default=None, help="save a checkpoint every N strings")
+    parser.add_argument("--checkpoint-interval", type=float, metavar="SECONDS", default=60, help="save a checkpoint every SECONDS seconds, default: %(default)s")
+    parser.add_argument("--resume", action="store_true", help="continue from the position saved in the --checkpoint file, if it exists, appending to the output")
+    args = parser.parse_args(argv)
+    if args.verbose > 0:
+        enable_logging("INFO" if args.verbose == 1 else "DEBUG")
+    if args.self_test:
+        if not __debug__:
+            parser.error("--self-test needs the assertions, run it without -O")
+        import runpy
+
+        runpy.run_module("tests", run_name="__main__")  # as __main__, like python tests.py, for the parallel tests
+        print("all tests passed", file=sys.stderr)
+        return
+    if args.multiplicity and args.random is None:
+        parser.error("--multiplicity can only be used with --random")
+    if args.checkpoint is not None and (args.random is not None or args.unordered):
+        parser.error("--checkpoint can't be used with --random or --unordered, their output can't be resumed")
+    filters = {k: getattr(args, k) for k in FILTERS}
+    if args.order != "rule":
+        filters["order"] = args.order
+    if args.order == "shortlex" and not args.unique:
+        parser.error("--order shortlex generates each distinct string once, it needs --unique")
+    if any(v is not None for k, v in filters.items() if k != "max_len") and args.random is not None:
+        parser.error("--min-len, --prefix, --lower, --upper and --order can't be used with --random")
+    if any(v is not None for k, v in filters.items() if k != "max_len") and args.jobs is not None and args.jobs > 1:
+        parser.error("--min-len, --prefix, --lower, --upper and --order can't be used with --jobs")
+    ranked = args.top is not None or args.min_prob is not None or args.weights is not None
+    if ranked and (args.random is not None or (args.jobs is not None and args.jobs > 1) or any(v is not None for k, v in filters.items() if k != "max_len")):
+        parser.error("--top, --min-prob and --weights can only be used with --max-len, not with --random, --jobs or the other filters")
+    if ranked and any(i is not None and i < 0 for i in (args.start, args.stop)):
+        parser.error("--top, --min-prob and --weights can't be used with a negative --start or --stop")
+    if args.front_coded and (args.random is not None or ranked or (args.jobs is not None and args.jobs > 1)):
+        parser.error("--front-coded can't be used with --random, --top, --min-prob, --weights or --jobs")
+    if args.jobs is not None and args.jobs > 1 and (args.unique or args.backend != "recursive" or args.random is not None):
+        parser.error("--jobs can't be used with --unique, --backend or --random, the workers generate from an index of the rule")
+    if args.front_coded and args.split_size is not None:
+        parser.error("--front-coded can't be used with --split-size, the files after the first one would not decode on their own")
+    if args.batch is not None:
+        if args.random is not None or args.checkpoint is not None or args.order != "rule" or ranked or args.unordered:
+            parser.error("--batch can't be used with --random, --checkpoint, --order, --unordered, --top, --min-prob or --weights")
+        import batch
+
+        args.rules = batch.read_rules(args.batch) + args.rules
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs a --checkpoint file")
+    if args.checkpoint is not None:
+        import checkpoint
+    state = None
+    if args.resume and os.path.exists(args.checkpoint):
+        state = checkpoint.load(args.checkpoint)
+        if state["rules"] != args.rules:
+            parser.error(f"the checkpoint {args.checkpoint!r} was saved for different rules: {state['rules']!r}")
+    charsets.set_alphabet(args.alphabet)
+    run_stats = None
+    if args.stats:
+        import stats
+
+        run_stats = stats.stats(progress=print_progress, interval=10)
+    with contextlib.nullcontext() if run_stats is None else run_stats.phase("parse"):
+        if args.load is None and args.dump is None:
+            parsed = [parse(rule) for rule in args.rules]
+        else:
+            import pattern
+
+            if args.load is not None:
+                loaded = pattern.load(args.load, add_to_cache=False)
+                pattern.set_cache_size(max(pattern.cache_size, len(loaded) + len(args.rules)))
+                for p in loaded:
+                    pattern.cache(p)
+            compiled = [pattern.compile(rule) for rule in args.rules]
+            parsed = [p.options for p in compiled]
+    if args.dump is not None:
+        pattern.dump(compiled, args.dump)
+    if args.batch is not None:
+        run_batch(parser, args, parsed, filters, run_stats)
+        return
+    if args.max_count is not None:  # refuse the whole job up front, before generating anything
+        for i, (rule, options) in enumerate(zip(args.rules, parsed), start=1):
+            try:
+                n = generated_count(options, **filters)
+            except ValueError as e:  # infinitely many strings
+                parser.exit(1, f"rule {i} {rule!r}: {e}\n")
+            if n > args.max_count:
+                parser.exit(1, f"rule {i} {rule!r} generates {n} strings, more than the maximum of {args.max_count}\n")
+    if args.count:
+        for i, (rule, options) in enumerate(zip(args.rules, parsed), start=1):
+            print(i, rule, file=sys.stderr)
+            try:
+                print(generated_count(options, **filters))
+            except ValueError as e:  # infinitely many strings
+                parser.exit(1, f"rule {i} {rule!r}: {e}\n")
+        return
+    import output
+
+    batch_size = output.BATCH_SIZE if args.checkpoint_every is None else max(1, min(output.BATCH_SIZE, args.checkpoint_every))
+    try:
+        out = output.writer(args.output, encoding=args.encoding, separator="\0" if args.null else "\n", compress=args.compress, split_size=args.split_size, batch_size=batch_size, resume=None if state is None else state["output"])
+    except ValueError as e:
+        parser.error(str(e))
+    last_checkpoint = [time.monotonic(), 0]  # time and strings written
+
+    def save_checkpoint(rule, index):
+        checkpoint.save(args.checkpoint, {"rules": args.rules, "rule": rule, "index": index, "output": out.sync()})
+        last_checkpoint[:] = time.monotonic(), out.written
+
+    if args.random is not None:
+        import random
+
+        import sample
+
+        rng = random.Random(args.seed)  # shared by the rules
+    with out, contextlib.nullcontext() if run_stats is None else run_stats.phase("gen"):
+        for i, (rule, options) in enumerate(zip(args.rules, parsed), start=1):
+            if state is not None and i - 1 < state["rule"]:
+                continue  # already done before resuming
+            print(i, rule, file=sys.stderr)
+            start = args.start
+            if state is not None and i - 1 == state["rule"] and state["index"] is not None:
+                start = state["index"]
+            on_batch = None
+            if args.checkpoint is not None:
+                # the checkpoints need the absolute index of the first string
+                if start is None:
+                    start = 0
+                elif start < 0:
+                    start = max(0, start + generated_count(options, unique=args.unique, **filters))
+
+                def on_batch(written, rule=i - 1, start=start):
+                    if (args.checkpoint_every is not None and out.written - last_checkpoint[1] >= args.checkpoint_every) or time.monotonic() - last_checkpoint[0] >= args.checkpoint_interval:
+                        save_checkpoint(rule, start + written)
+
+            if args.random is not None:
+                try:
+                    generated = sample.random_batch(options, args.random, seed=rng, multiplicity=args.multiplicity, max_len=args.max_len)
+                except ValueError as e:  # infinitely many strings, or none
+                    parser.exit(1, f"rule {i} {rule!r}: {e}\n")
+            elif ranked:
+                import weighted
+
+                weights = None if args.weights is None else weighted.load(options, args.weights)
+                generated = itertools.islice(weighted.gen(options, weights, top=args.top, min_prob=args.min_prob, unique=args.unique, max_len=args.max_len), start, args.stop)
+            elif args.front_coded:
+                import frontcode
+
+                generated = frontcode.encode(frontcode.diffs(options, start=start, stop=args.stop, backend=args.backend, unique=args.unique, **filters))
+            elif args.unique:
+                generated = gen(options, start=start, stop=args.stop, unique=True, **filters)
+            elif args.jobs is not None and args.jobs > 1:  # the workers send the strings already encoded
+                import parallel  # only imported when used, like vector, it takes longer to import than the rest
+
+                generated = None
+                try:
+                    chunks = parallel.encoded(options, jobs=args.jobs, ordered=not args.unordered, start=start, stop=args.stop, encoding=out.encoding, separator=out.separator, max_len=args.max_len)
+                except ValueError as e:  # infinitely many strings
+                    parser.exit(1, f"rule {i} {rule!r}: {e}\n")
+            elif args.backend == "vector" and all(v is None for v in filters.values()):  # written straight from the blocks, without creating the strings
+                import vector
+
+                generated = None
+                chunks = vector.encoded(options, start=start, stop=args.stop, encoding=out.encoding, separator=out.separator, block_size=out.batch_size)
+            else:
+                generated = gen(options, start=start, stop=args.stop, backend=args.backend, stats=run_stats, **filters)
+            if generated is not None:
+                out.write(generated if run_stats is None else run_stats.counted(generated), on_batch=on_batch)
+            else:
+                written, t = out.written, time.perf_counter()
+                out.write_encoded(chunks, on_batch=on_batch)
+                if run_stats is not None:  # no strings to count, only their number
+                    run_stats.generated += out.written - written
+                    run_stats.seconds += time.perf_counter() - t
+            if args.checkpoint is not None:
+                save_checkpoint(i, None)  # next rule, from its --start
+    if run_stats is not None:
+        print(run_stats.summary(), file=sys.stderr)
+
+
+def print_progress(run_stats):
+    print(f"{run_stats.generated} strings, {run_stats.rate():.0f} strings/s", file=sys.stderr)
+
+
+def run_batch(parser, args, parsed, filters, run_stats=None):
+    import batch
+    import output
+
+    try:
+        job = batch.batch(args.rules, parsed, **filters)
+        total = job.count(unique=args.unique)
+    except ValueError as e:  # infinitely many strings
+        parser.exit(1, f"{e}\n")
+    if args.count:
+        for i, (rule, n) in enumerate(zip(args.rules, job.counts), start=1):
+            print(i, rule, file=sys.stderr)
+            print(n)
+        print("total", file=sys.stderr)
+        print(total)
+        return
+    if args.max_count is not None and total > args.max_count:
+        parser.exit(1, f"the rules generate {total} strings, more than the maximum of {args.max_count}\n")
+
+    def on_rule(i):
+        print(i + 1, args.rules[i], job.counts[i], file=sys.stderr)
+
+    try:
+        out = output.writer(args.output, encoding=args.encoding, separator="\0" if args.null else "\n", compress=args.compress, split_size=args.split_size)
+    except ValueError as e:
+        parser.error(str(e))
+    with out, contextlib.nullcontext() if run_stats is None else run_stats.phase("gen"):
+        generated = job.gen(start=args.start, stop=args.stop, jobs=args.jobs, unique=args.unique, on_rule=None if args.unique else on_rule, backend=args.backend, stats=run_stats)
+        if args.front_coded:
+            import frontcode
+
+            generated = frontcode.encode(frontcode.shared(generated))
+        out.write(generated if run_stats is None else run_stats.counted(generated))
+    if args.unique:
+        print("total", out.written, file=sys.stderr)
+    if run_stats is not None:
+        print(run_stats.summary(), file=sys.stderr)
 
-if __debug__:
-    import tests
 
 if __name__ == "__main__":
-    for i, rule in enumerate(sys.argv):
-        if i == 0:
-            continue
-        print(i, rule, file=sys.stderr)
-        for g in gen(parse(rule)):
-            print(g)
+    main()
@@ -0,0 +1,266 @@
+from itertools import islice
+
+import unbounded
+import unique as unique_automaton
+from charsets import charset
+
+ORDERS = ("rule", "length", "shortlex")
+
+
+def convolve(a, b, max_len=None):
+    # histogram of the lengths of a string of histogram a followed by a string of histogram b
+    result = dict()
+    for la, ca in a.items():
+        for lb, cb in b.items():
+            if max_len is None or la + lb <= max_len:
+                result[la + lb] = result.get(la + lb, 0) + ca * cb
+    return result
+
+
+# histograms of the lengths generated by each node, length -> number of strings of that length
+# lengths above max_len are left out, the strings containing them are longer
+class length_index:
+    def __init__(self, options, max_len=None):
+        self.options = options  # keep a reference so that the node ids stay valid
+        self.max_len = max_len
+        self.ands = dict()  # id(and node) -> suffix histograms, ands[id][i] is the histogram of options[i:]
+        self.ors = dict()  # id(or node) -> histogram
+        self.total = self.and_histogram(options)
+
+    def and_histogram(self, options, i=0):
+        if isinstance(options, str):
+            return {len(options): 1}
+        suffixes = self.ands.get(id(options))
+        if suffixes is None:
+            if len(options) == 0:
+                suffixes = [dict()]  # an empty and generates nothing
+            else:
+                suffixes = [{0: 1}]
+                for o in reversed(options):
+                    suffixes.append(convolve(self.or_histogram(o), suffixes[-1], self.max_len))
+                suffixes.reverse()
+            self.ands[id(options)] = suffixes
+        return suffixes[i]
+
+    def or_histogram(self, options):
+        if isinstance(options, str):
+            return {len(options): 1}
+        histogram = self.ors.get(id(options))
+        if histogram is None:
+            if isinstance(options, unbounded.repeat):
+                return self.repeat_histogram(options)
+            histogram = dict()
+            if isinstance(options, charset):
+                if len(options) > options.optional and (self.max_len is None or self.max_len >= 1):
+                    histogram[1] = len(options) - options.optional
+                if options.optional:
+                    histogram[0] = 1
+            else:
+                for o in options:
+                    for length, n in self.and_histogram(o).items():
+                        if self.max_len is None or length <= self.max_len:
+                            histogram[length] = histogram.get(length, 0) + n
+            self.ors[id(options)] = histogram
+        return histogram
+
+    def repeat_histogram(self, options):
+        option = self.or_histogram(options.option)
+        shortest = min(option, default=0)
+        if self.max_len is not None and shortest > 0 and self.max_len // shortest <= options.count:
+            # max_len leaves room for count repetitions at most, as in the expansions of the stars: each level
+            # generates the option repeated any number of times, up to the lengths that can still follow the
+            # repetitions before it, so all the levels share that histogram instead of one convolution per level
+            histogram = {0: 1}
+            for length in range(1, self.max_len + 1):
+                n = sum(c * histogram.get(length - a, 0) for a, c in option.items() if a <= length)
+                if n > 0:
+                    histogram[length] = n
+            repeated = {length: n for length, n in histogram.items() if length > 0}
+            while isinstance(options, unbounded.repeat):
+                self.ands[id(options[0])] = [repeated, histogram, {0: 1}]
+                self.ors[id(options)] = histogram
+                options = options.rest
+            return histogram
+        # the levels from the innermost one, each generates the option followed by the next level, or nothing
+        links = []
+        while isinstance(options, unbounded.repeat) and id(options) not in self.ors:
+            links.append(options)
+            options = options.rest
+        below = self.or_histogram(options)
+        for link in reversed(links):
+            repeated = convolve(option, below, self.max_len)
+            self.ands[id(link[0])] = [repeated, below, {0: 1}]
+            below = self.ors[id(link)] = {**repeated, 0: repeated.get(0, 0) + 1}
+        return below
+
+    # same as r_and_gen and r_or_gen but only the strings whose length (without generated) is in lengths
+    def and_gen(self, options, lengths, i=0, generated=""):
+        if isinstance(options, str):
+            if len(options) in lengths:
+                yield generated + options
+            return
+        last = len(options) - 1
+        if i >= last:
+            if i == last:
+                yield from self.or_gen(options[i], lengths, generated)
+            elif i > 0 and 0 in lengths:
+                yield generated
+            return
+        # the odometer of and_strings(), stack[j] yields the strings of options[i + j] with the lengths that can
+        # still be completed by the or nodes after it, wanted[j] the lengths asked for options[i + j:] after the
+        # strings of n[j] characters generated before
+        suffixes = self.ands[id(options)]
+        stack = [(self.heads_gen(options[i], suffixes[i + 1], lengths, generated), lengths, len(generated))]
+        while stack:
+            strings, wanted, n = stack[-1]
+            g = next(strings, None)
+            if g is None:
+                stack.pop()
+                continue
+            j = i + len(stack)
+            used = len(g) - n
+            rest = {total - used for total in wanted if total - used in suffixes[j]}
+            if j < last:
+                stack.append((self.heads_gen(options[j], suffixes[j + 1], rest, g), rest, len(g)))
+            else:
+                yield from self.or_gen(options[last], rest, g)
+
+    def heads_gen(self, options, after, lengths, generated):
+        # the strings of the or node options with the lengths that can still be completed by a string of histogram after
+        heads = {length for length in self.or_histogram(options) if any(total - length in after for total in lengths)}
+        return self.or_gen(options, heads, generated) if len(heads) > 0 else iter(())
+
+    def or_gen(self, options, lengths, generated=""):
+        if isinstance(options, str):
+            if len(options) in lengths:
+                yield generated + options
+            return
+        if isinstance(options, unbounded.repeat):
+            yield from self.repeat_gen(options, lengths, generated)
+            return
+        if isinstance(options, charset):
+            if 1 in lengths:
+                yield from (generated + c for c in islice(options, len(options) - options.optional))
+            if 0 in lengths and options.optional:
+                yield generated
+            return
+        for o in options:
+            if isinstance(o, str):
+                if len(o) in lengths:
+                    yield generated + o
+            elif any(length in lengths for length in self.and_histogram(o)):
+                yield from self.and_gen(o, lengths, generated=generated)
+
+    def repeat_gen(self, options, lengths, generated=""):
+        # the levels of a repeat as or_gen() and and_gen() would walk them, like gen.repeat_strings(): stack[j]
+        # yields the strings of the option after the j ones before, with the histogram and the node of the next
+        # level, the lengths the level was asked for and the string it was given, which it yields last
+        option, histogram = options.option, self.or_histogram(options.option)
+        stack = []
+        while True:
+            heads = None
+            if isinstance(options, unbounded.repeat):
+                after = self.or_histogram(options.rest)
+                heads = {length for length in histogram for total in lengths if total - length in after}
+            if heads:
+                stack.append((self.or_gen(option, heads, generated), after, options.rest, lengths, generated))
+            elif 0 in lengths:
+                yield generated  # nothing more fits, or the innermost level, [""]
+            while stack:
+                strings, after, rest, wanted, prefix = stack[-1]
+                g = next(strings, None)
+                if g is None:
+                    stack.pop()
+                    if 0 in wanted:
+                        yield prefix
+                    continue
+                used = len(g) - len(prefix)
+                options, lengths, generated = rest, {total - used for total in wanted if total - used in after}, g
+                break
+            else:
+                return
+
+    def count(self, min_len=0, max_len=None):
+        return sum(n for length, n in self.total.items() if min_len <= length and (max_len is None or length <= max_len))
+
+    # the k-th of the strings no longer than max_len, one per way of generating them, in an order of their own: by
+    # length, then by the lengths of the nodes, without generating the others, for sampling
+    def nth(self, k):
+        for length, n in sorted(self.total.items()):
+            if k < n:
+                return self.and_nth(self.options, k, length)
+            k -= n
+        raise IndexError(f"generation index out of range, {k} is not in [0, {sum(self.total.values())})")
+
+    def and_nth(self, options, k, length):
+        if isinstance(options, str):
+            return options
+        parts = []
+        for i, o in enumerate(options):
+            after = self.and_histogram(options, i + 1)
+            for l, n in self.or_histogram(o).items():
+                m = after.get(length - l, 0)
+                if k < n * m:
+                    q, k = divmod(k, m)
+                    parts.append(self.or_nth(o, q, l))
+                    length -= l
+                    break
+                k -= n * m
+        return "".join(parts)
+
+    def or_nth(self, options, k, length):
+        if isinstance(options, str):
+            return options
+        if isinstance(options, charset):
+            return options[k] if length > 0 else ""
+        if isinstance(options, unbounded.repeat):
+            return self.repeat_nth(options, k, length)
+        for o in options:
+            n = self.and_histogram(o).get(length, 0)
+            if k < n:
+                return self.and_nth(o, k, length)
+            k -= n
+
+    def repeat_nth(self, options, k, length):
+        # the levels one after the other, each one the option followed by the next level until length is used up
+        parts = []
+        while length > 0 and isinstance(options, unbounded.repeat):
+            below = self.or_histogram(options.rest)
+            for l, n in self.or_histogram(options.option).items():
+                m = below.get(length - l, 0)
+                if k < n * m:
+                    q, k = divmod(k, m)
+                    parts.append(self.or_nth(options.option, q, l))
+                    length -= l
+                    break
+                k -= n * m
+            options = options.rest
+        return "".join(parts)
+
+    def gen(self, min_len=0, max_len=None, start=0):
+        # all the strings of each length one length after the other, in the order of gen() within a length
+        # the lengths before the start-th string are skipped without generating them
+        for length in sorted(self.total):
+            if min_len <= length and (max_len is None or length <= max_len):
+                if start >= self.total[length]:
+                    start -= self.total[length]
+                    continue
+                yield from islice(self.and_gen(self.options, {length}), start, None)
+                start = 0
+
+
+def histogram(options, max_len=None):
+    return dict(sorted(length_index(options, max_len=max_len).total.items()))
+
+
+# strings ordered by length, within a length in the order of gen() for "length" and lexicographically for "shortlex"
+# with unique each distinct string is generated only once, "shortlex" needs it
+def gen(options, order="length", unique=False, min_len=None, max_len=None, start=None):
+    if order not in ORDERS[1:]:
+        raise ValueError(f"unknown length order {order!r}, expected one of {ORDERS[1:]}")
+    if order == "shortlex" and not unique:
+        raise ValueError("order='shortlex' generates each distinct string once, it needs unique=True")
+    min_len = 0 if min_len is None else min_len
+    if unique:
+        return islice(unique_automaton.dfa(options).gen_by_length(sort=order == "shortlex", min_len=min_len, max_len=max_len), start, None)
+    return length_index(options, max_len=max_len).gen(min_len=min_len, max_len=max_len, start=0 if start is None else start)
@@ -0,0 +1,143 @@
+import enum
+from itertools import chain, islice, product
+
+from charsets import charset
+
+MERGE_LIMIT = 1 << 12  # max number of strings materialized when merging consecutive sets
+
+
+class Plan(enum.IntEnum):
+    SET = enum.auto()
+    AND = enum.auto()
+    OR = enum.auto()
+
+
+EMPTY = (Plan.SET, (), 0)
+
+
+# a plan is a (kind, payload, size) tuple:
+# (SET, values, len(values)) yields each of the values, a tuple or a charset
+# (AND, children, size) yields the product of its children, last child varying fastest
+# (OR, alternatives, size) yields each of the alternatives one after the other
+def plan_and(options):
+    if isinstance(options, str):
+        return (Plan.SET, (options,), 1)
+    children = []
+    for o in options:
+        p = plan_or(o)
+        if p[2] == 0:
+            return EMPTY
+        if p[0] == Plan.AND:
+            children.extend(p[1])
+        else:
+            children.append(p)
+    if len(children) == 0:
+        return EMPTY  # an empty and generates nothing
+    children = merge_sets(children)
+    if len(children) == 1:
+        return children[0]
+    size = 1
+    for p in children:
+        size *= p[2]
+    return (Plan.AND, tuple(children), size)
+
+
+def plan_or(options):
+    if isinstance(options, str):
+        return (Plan.SET, (options,), 1)
+    if isinstance(options, charset):
+        return (Plan.SET, options, len(options)) if len(options) > 0 else EMPTY
+    alternatives = []
+    for o in options:
+        p = plan_and(o)
+        if p[2] == 0:
+            continue
+        if p[0] == Plan.OR:
+            alternatives.extend(p[1])
+        elif p[0] == Plan.SET and len(alternatives) > 0 and alternatives[-1][0] == Plan.SET and isinstance(p[1], tuple) and isinstance(alternatives[-1][1], tuple):
+            values = alternatives[-1][1] + p[1]
+            alternatives[-1] = (Plan.SET, values, len(values))
+        else:
+            alternatives.append(p)
+    if len(alternatives) == 0:
+        return EMPTY
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return (Plan.OR, tuple(alternatives), sum(p[2] for p in alternatives))
+
+
+def merge_sets(children):
+    # materialize the products of runs of consecutive sets, from the right so that the innermost loop is the biggest
+    merged = []
+    run = []
+    size = 1
+    for p in reversed(children):
+        if p[0] == Plan.SET and (len(run) == 0 or size * p[2] <= MERGE_LIMIT):
+            run.append(p)
+            size *= p[2]
+            continue
+        if len(run) > 0:
+            merged.append(merge_run(run))
+        if p[0] == Plan.SET:
+            run = [p]
+            size = p[2]
+        else:
+            merged.append(p)
+            run = []
+            size = 1
+    if len(run) > 0:
+        merged.append(merge_run(run))
+    merged.reverse()
+    return merged
+
+
+def merge_run(run):
+    if len(run) == 1:
+        return run[0]
+    values = tuple(map("".join, product(*(p[1] for p in reversed(run)))))
+    return (Plan.SET, values, len(values))
+
+
+def plan(options):
+    return plan_and(options)
+
+
+# yields prefix + each string of the plan, starting from the k-th one
+def run(plan, prefix="", k=0):
+    kind, payload, size = plan
+    if kind == Plan.SET:
+        if isinstance(payload, charset):
+            return map(prefix.__add__, payload.chars(k))
+        return map(prefix.__add__, islice(payload, k, None) if k else payload)
+    if kind == Plan.OR:
+        return run_or(payload, prefix, k)
+    return run_and(payload, prefix, k)
+
+
+def run_or(alternatives, prefix, k):
+    for i, p in enumerate(alternatives):
+        if k < p[2]:
+            break
+        k -= p[2]
+    return chain(run(p, prefix, k), chain.from_iterable(run(p, prefix) for p in alternatives[i + 1:]))
+
+
+def run_and(children, prefix, k):
+    # odometer over the children: stack[i] iterates children[i] given the prefix built by the previous children,
+    # so advancing a child only rebuilds the part of the strings after it
+    offsets = [0] * len(children)
+    for i in reversed(range(len(children))):
+        k, offsets[i] = divmod(k, children[i][2])
+    last = len(children) - 1
+    stack = [run(children[0], prefix, offsets[0])]
+    while stack:
+        v = next(stack[-1], None)
+        if v is None:
+            stack.pop()
+            continue
+        i = len(stack)
+        if i == last:
+            yield from run(children[i], v, offsets[i])
+        else:
+            stack.append(run(children[i], v, offsets[i]))
+        offsets[i] = 0  # only the first string of each child starts from an offset
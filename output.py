@@ -0,0 +1,167 @@
+import os
+import sys
+from itertools import islice
+
+BATCH_SIZE = 1 << 16  # strings encoded and written at once
+COMPRESSIONS = ("gzip", "bz2", "lzma")
+
+
+def compressed(f, compress):
+    match compress:
+        case None:
+            return f
+        case "gzip":
+            import gzip
+
+            return gzip.GzipFile(fileobj=f, mode="wb")
+        case "bz2":
+            import bz2
+
+            return bz2.BZ2File(f, mode="wb")
+        case "lzma":
+            import lzma
+
+            return lzma.LZMAFile(f, mode="wb")
+    raise ValueError(f"unknown compression {compress!r}, expected one of {COMPRESSIONS}")
+
+
+# writes strings separated (and terminated) by separator, in big encoded batches
+# to stdout when file is None, or to file, or to file.000, file.001, ... of at most split_size bytes each
+# resume takes a position returned by sync() and continues writing from there, dropping what was written after it
+class writer:
+    def __init__(self, file=None, encoding="utf-8", separator="\n", compress=None, split_size=None, batch_size=BATCH_SIZE, resume=None):
+        if split_size is not None and file is None:
+            raise ValueError("splitting the output needs an output file")
+        if split_size is not None and split_size <= 0:
+            raise ValueError(f"invalid split size {split_size!r}, it must be positive")
+        if split_size is not None and len(separator) == 0:
+            raise ValueError("splitting the output needs a separator")
+        self.file = file
+        self.encoding = encoding
+        self.separator = separator
+        self.separator_bytes = separator.encode(encoding)
+        self.compress = compress
+        self.split_size = split_size
+        self.batch_size = batch_size
+        self.resume = resume
+        self.parts = 0
+        self.written = 0  # strings written
+        self.out = None  # current raw file
+        self.stream = None  # current file, through compression
+        self.size = 0  # uncompressed bytes written to the current file
+
+    def part_name(self, part):
+        if self.split_size is None:
+            return self.file
+        return f"{self.file}.{part:03d}"
+
+    def open(self):
+        size = 0
+        if self.file is None:
+            sys.stdout.flush()
+            self.out = sys.stdout.buffer
+        elif self.resume is not None and os.path.exists(self.part_name(self.resume["part"])):
+            self.parts = self.resume["part"]
+            self.out = open(self.part_name(self.parts), "r+b")
+            self.out.truncate(self.resume["offset"])
+            self.out.seek(self.resume["offset"])
+            size = self.resume["size"]
+        else:
+            if self.resume is not None:
+                self.parts = self.resume["part"]
+            self.out = open(self.part_name(self.parts), "wb")
+        self.resume = None
+        self.parts += 1
+        self.stream = compressed(self.out, self.compress)
+        self.size = size
+
+    def close_part(self):
+        if self.stream is not self.out:
+            self.stream.close()  # does not close the underlying raw file
+        if self.out is sys.stdout.buffer:
+            self.out.flush()
+        else:
+            self.out.close()
+        self.out = self.stream = None
+
+    def write_bytes(self, data):
+        if self.stream is None:
+            self.open()
+        if self.split_size is not None and not isinstance(data, bytes):
+            data = bytes(data)  # buffers from vector.encoded()
+        while self.split_size is not None and self.size + len(data) > self.split_size:
+            # cut after the last string that still fits in the current file
+            cut = data.rfind(self.separator_bytes, 0, self.split_size - self.size)
+            if cut < 0 and self.size == 0:
+                cut = data.find(self.separator_bytes)  # a string bigger than split_size gets a file of its own
+            if cut >= 0:
+                cut += len(self.separator_bytes)
+                self.stream.write(data[:cut])
+                data = data[cut:]
+            self.close_part()
+            if len(data) == 0:
+                return
+            self.open()
+        self.stream.write(data)
+        self.size += len(data)
+
+    # on_batch is called after each batch with the number of strings written by this call so far
+    def write(self, strings, on_batch=None):
+        strings = iter(strings)
+        written = 0
+        while True:
+            batch = list(islice(strings, self.batch_size))
+            if len(batch) == 0:
+                return self.written
+            batch.append("")  # terminate the last string too
+            self.write_bytes(self.separator.join(batch).encode(self.encoding))
+            self.written += len(batch) - 1
+            written += len(batch) - 1
+            if on_batch is not None:
+                on_batch(written)
+
+    # same as write() for chunks already encoded by vector.encoded(), (data, number of strings) pairs
+    def write_encoded(self, chunks, on_batch=None):
+        written = 0
+        for data, n in chunks:
+            self.write_bytes(data)
+            self.written += n
+            written += n
+            if on_batch is not None:
+                on_batch(written)
+        return self.written
+
+    # makes everything written so far durable and returns the position to resume from
+    def sync(self):
+        if self.resume is not None:
+            return self.resume  # nothing written since resuming
+        if self.stream is None:
+            return {"part": self.parts, "offset": 0, "size": 0}
+        restart = self.stream is not self.out
+        if restart:  # end the compressed stream here, later data goes in a new concatenated one
+            self.stream.close()
+        self.out.flush()
+        offset = None
+        if self.file is not None:
+            os.fsync(self.out.fileno())
+            offset = self.out.tell()
+        if restart:
+            self.stream = compressed(self.out, self.compress)
+        return {"part": self.parts - 1, "offset": offset, "size": self.size}
+
+    def flush(self):
+        if self.stream is not None:
+            self.stream.flush()
+            self.out.flush()
+
+    def close(self):
+        if self.stream is None and self.parts == 0 and self.file is not None:
+            self.open()  # create the file even when there is nothing to write
+        if self.stream is not None:
+            self.close_part()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,116 @@
+import os
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+
+import lengths
+import unbounded
+from gen import generated_count, size_index
+
+CHUNK_SIZE = 1 << 16
+
+# worker process state, set once by _init so that tasks only carry their range
+_index = None
+_encoding = None  # None to return the strings themselves rather than encoded
+_separator = None
+_max_len = None  # None to keep all the strings rather than only the ones at most that long
+
+
+def _init(options, encoding=None, separator="\n", max_len=None):
+    global _index, _encoding, _separator, _max_len
+    _index = size_index(options)
+    _encoding = encoding
+    _separator = separator
+    _max_len = max_len
+
+
+def _chunk(start, stop):
+    # (data, number of strings), data is the strings each followed by the separator, encoded, so that the parent
+    # writes it as is instead of receiving and encoding each of the strings
+    strings = islice(_index.and_gen(_index.options, start), stop - start)
+    strings = list(strings if _max_len is None else (s for s in strings if len(s) <= _max_len))
+    if _encoding is None:
+        return strings, len(strings)
+    strings.append("")  # terminate the last string too
+    return _separator.join(strings).encode(_encoding), len(strings) - 1
+
+
+def chunks(options, jobs=None, ordered=True, chunk_size=CHUNK_SIZE, start=None, stop=None, encoding=None, separator="\n", max_len=None):
+    # yields the (data, number of strings) chunks of the workers, in order or as soon as they are done
+    # with max_len only the strings at most that long, the repetitions without a maximum expanded for it like gen()
+    # the errors are raised here rather than once the chunks are iterated
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if unbounded.unbounded(options):
+        if max_len is not None:
+            options = unbounded.expand(options, max_len)
+        elif unbounded.infinite(options):
+            raise ValueError("the rule generates infinitely many strings, give a max_len")
+        else:
+            options = unbounded.expand(options, 0)
+    if max_len is not None and max(lengths.histogram(options), default=0) <= max_len:
+        max_len = None  # no string to drop, the chunks are the ranges of the strings of the index
+    total = size_index(options).total
+    if max_len is None:
+        start, stop, _ = slice(start, stop).indices(total)
+        return _chunks(options, jobs, ordered, chunk_size, start, stop, (options, encoding, separator))
+    # the workers drop the longer strings, so where the start-th string and the stop-th one are is only known once
+    # the chunks before them are done: the parent skips the strings in order and encodes the ones it keeps
+    count = generated_count(options, max_len=max_len)
+    start, stop, _ = slice(start, stop).indices(count)
+    if start == 0 and stop == count:
+        return _chunks(options, jobs, ordered, chunk_size, 0, total, (options, encoding, separator, max_len))
+    return _sliced(_chunks(options, jobs, True, chunk_size, 0, total, (options, None, separator, max_len)), start, stop, encoding, separator)
+
+
+def _chunks(options, jobs, ordered, chunk_size, start, stop, initargs):
+    window = 2 * jobs  # bound the number of chunks held in memory
+    executor = ProcessPoolExecutor(jobs, initializer=_init, initargs=initargs)
+    try:
+        pending = deque() if ordered else set()
+        for a in range(start, stop, chunk_size):
+            future = executor.submit(_chunk, a, min(a + chunk_size, stop))
+            if ordered:
+                pending.append(future)
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            else:
+                pending.add(future)
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        yield f.result()
+        while pending:
+            if ordered:
+                yield pending.popleft().result()
+            else:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield f.result()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _sliced(chunks, start, stop, encoding, separator):
+    # the strings from the start-th one to the stop-th one of ordered chunks of strings
+    for strings, n in chunks:
+        kept = strings[max(0, start) : max(0, stop)]
+        start, stop = start - n, stop - n
+        if len(kept) > 0:
+            if encoding is None:
+                yield kept, len(kept)
+            else:
+                kept.append("")
+                yield separator.join(kept).encode(encoding), len(kept) - 1
+        if stop <= 0:
+            return
+
+
+# yields (bytes, number of strings) chunks of the encoded strings each followed by separator, like vector.encoded()
+def encoded(options, jobs=None, ordered=True, chunk_size=CHUNK_SIZE, start=None, stop=None, encoding="utf-8", separator="\n", max_len=None):
+    return chunks(options, jobs, ordered, chunk_size, start, stop, encoding, separator, max_len)
+
+
+def gen(options, jobs=None, ordered=True, chunk_size=CHUNK_SIZE, start=None, stop=None, max_len=None):
+    for strings, _ in chunks(options, jobs, ordered, chunk_size, start, stop, max_len=max_len):
+        yield from strings
@@ -0,0 +1,89 @@
+import pickle
+from collections import OrderedDict
+
+import charsets
+from gen import gen, nth, parse, size_index
+
+FORMAT_VERSION = 3  # bump when the parsed structure changes, files with another version are refused
+
+cache_size = 1024
+_cache = OrderedDict()  # (alphabet, rule) -> Pattern, least recently used first
+
+
+class Pattern:
+    def __init__(self, rule, options=None, alphabet=None):
+        self.rule = rule
+        self.alphabet = charsets.alphabet_name if alphabet is None else alphabet  # the one negated sets were parsed with
+        self.options = parse(rule) if options is None else options
+        self._index = None
+
+    def __reduce__(self):  # the size index is keyed by node ids, rebuild it instead of pickling it
+        return (Pattern, (self.rule, self.options, self.alphabet))
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.rule!r})"
+
+    def __iter__(self):
+        return self.gen()
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = size_index(self.options)
+        return self._index
+
+    def count(self):
+        return self.index.total
+
+    def nth(self, k):
+        return nth(self.options, k, index=self.index)
+
+    def gen(self, **kwargs):
+        return gen(self.options, **kwargs)
+
+
+def cache(pattern):
+    _cache[pattern.alphabet, pattern.rule] = pattern
+    _cache.move_to_end((pattern.alphabet, pattern.rule))
+    while len(_cache) > cache_size:
+        _cache.popitem(last=False)
+
+
+def compile(rule):
+    # with the current alphabet of charsets
+    key = (charsets.alphabet_name, rule)
+    p = _cache.get(key)
+    if p is None:
+        p = Pattern(rule)
+        cache(p)
+    else:
+        _cache.move_to_end(key)
+    return p
+
+
+def set_cache_size(size):
+    global cache_size
+    cache_size = size
+    while len(_cache) > cache_size:
+        _cache.popitem(last=False)
+
+
+def clear_cache():
+    _cache.clear()
+
+
+def dump(patterns, file):
+    with open(file, "wb") as f:
+        pickle.dump((FORMAT_VERSION, [(p.rule, p.options, p.alphabet) for p in patterns]), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def load(file, add_to_cache=True):
+    with open(file, "rb") as f:
+        version, patterns = pickle.load(f)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"unsupported compiled patterns file format version {version!r}, expected {FORMAT_VERSION!r}: {file}")
+    patterns = [Pattern(rule, options, alphabet) for rule, options, alphabet in patterns]
+    if add_to_cache:
+        for p in patterns:
+            cache(p)
+    return patterns
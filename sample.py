@@ -0,0 +1,72 @@
+import random
+import sys
+
+import lengths
+import unbounded
+import unique as unique_automaton
+from gen import size_index
+
+
+# uniform random strings of a parsed rule, each distinct string is equally likely: the strings are picked by their
+# index among the ones of the deterministic automaton
+# multiplicity=True picks alternatives weighted by the size of their subtree instead, so a string the rule generates
+# twice is twice as likely, without building the automaton
+# with a max_len only the strings no longer than it are picked, the unbounded repetitions are expanded to it first
+class sampler:
+    def __init__(self, options, seed=None, multiplicity=False, max_len=None):
+        if unbounded.unbounded(options):
+            if max_len is None and unbounded.infinite(options):
+                raise ValueError("the rule generates infinitely many strings, give a max_len")
+            options = unbounded.expand(options, 0 if max_len is None else max_len)
+        self.options = options
+        self.random = seed if isinstance(seed, random.Random) else random.Random(seed)
+        if not multiplicity:
+            self.automaton = unique_automaton.dfa(options)
+            self.total = self.automaton.within(self.automaton.start, max_len)
+            self.nth = lambda k: self.automaton.nth(k, max_len)
+        elif max_len is not None:
+            index = lengths.length_index(options, max_len=max_len)
+            self.total = index.count()
+            self.nth = index.nth
+        else:
+            index = size_index(options)
+            self.total = index.total
+            self.nth = lambda k: index.and_nth(options, k)
+        if self.total == 0:
+            raise ValueError("can't sample from a rule that generates nothing")
+
+    def one(self):
+        return self.nth(self.random.randrange(self.total))
+
+    def batch(self, k):  # with replacement
+        randrange = self.random.randrange
+        nth = self.nth
+        total = self.total
+        return [nth(randrange(total)) for _ in range(k)]
+
+    def sample(self, k):  # without replacement, like random.sample
+        if k > self.total:
+            raise ValueError(f"sample larger than the number of strings, {k} > {self.total}")
+        if self.total <= sys.maxsize:
+            return list(map(self.nth, self.random.sample(range(self.total), k)))
+        # random.sample can't take a range this big, but then k is tiny in comparison and collisions are rare
+        picked = dict()
+        while len(picked) < k:
+            picked[self.random.randrange(self.total)] = None
+        return list(map(self.nth, picked))
+
+    def stream(self, batch_size=1024):
+        while True:
+            yield from self.batch(batch_size)
+
+
+def sample(options, k, seed=None, multiplicity=False, max_len=None):
+    return sampler(options, seed=seed, multiplicity=multiplicity, max_len=max_len).sample(k)
+
+
+def random_batch(options, k, seed=None, multiplicity=False, max_len=None):
+    return sampler(options, seed=seed, multiplicity=multiplicity, max_len=max_len).batch(k)
+
+
+def random_stream(options, seed=None, multiplicity=False, batch_size=1024, max_len=None):
+    return sampler(options, seed=seed, multiplicity=multiplicity, max_len=max_len).stream(batch_size)
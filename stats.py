@@ -0,0 +1,116 @@
+from contextlib import contextmanager
+from time import perf_counter
+
+from charsets import charset
+from gen import gen as gen_strings, r_and_gen
+
+PROGRESS_EVERY = 1 << 12  # strings generated between two looks at the clock for the progress callback
+
+
+# counters of a node of a parsed rule, its time includes the time spent in its children
+class node_stats:
+    __slots__ = ("fanout", "calls", "yielded", "seconds")
+
+    def __init__(self, fanout):
+        self.fanout = fanout  # alternatives of an or node, or nodes of an and node
+        self.calls = 0  # times the node was walked, once per string generated before it by its and node
+        self.yielded = 0
+        self.seconds = 0.0
+
+
+# instrumentation of the generation, nothing of it runs unless a stats object is given to gen():
+# the strings generated and the time of each phase, a progress callback, and counters of each node of the parsed
+# rule when it is walked by the recursive backend (gen() without start, stop or constraints), the other backends
+# and the walks from an index only count the strings
+class stats:
+    def __init__(self, progress=None, interval=1.0):
+        self.progress = progress  # called as progress(self) about every interval seconds while generating
+        self.interval = interval
+        self.phases = dict()  # name -> seconds
+        self.generated = 0
+        self.seconds = 0.0  # time spent generating the strings counted
+        self.nodes = dict()  # id(node) -> node_stats
+        self.roots = []  # the rules walked, to keep the node ids valid and report the nodes by path
+
+    @contextmanager
+    def phase(self, name):
+        t = perf_counter()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - t
+
+    def gen(self, options, **kwargs):
+        # gen(options, **kwargs) with the strings counted and the nodes instrumented
+        return self.counted(gen_strings(options, stats=self, **kwargs))
+
+    def counted(self, generated):
+        t = last = perf_counter()
+        try:
+            for g in generated:
+                self.generated += 1
+                if self.progress is not None and self.generated % PROGRESS_EVERY == 0:
+                    now = perf_counter()
+                    if now - last >= self.interval:
+                        self.seconds += now - t
+                        t = last = now
+                        self.progress(self)
+                yield g
+        finally:
+            self.seconds += perf_counter() - t
+
+    def rate(self):
+        # strings per second
+        return self.generated / self.seconds if self.seconds > 0 else 0.0
+
+    def walk(self, options):
+        # the strings of the rule, walked like gen() does without start and stop
+        if all(r is not options for r in self.roots):
+            self.roots.append(options)
+        return r_and_gen(options, hook=self.timed)
+
+    def timed(self, kind, options, generated, strings):
+        # the hook of r_and_gen and r_or_gen, counting the strings each node yields and the time spent in it
+        node = self.nodes.get(id(options))
+        if node is None:
+            node = self.nodes[id(options)] = node_stats(len(options))
+        node.calls += 1
+        t = perf_counter()
+        try:
+            for g in strings:
+                node.seconds += perf_counter() - t
+                node.yielded += 1
+                yield g
+                t = perf_counter()
+        finally:
+            node.seconds += perf_counter() - t
+
+    def paths(self):
+        # (rule number, path, kind, node) of the nodes walked, by the first path reaching each shared node,
+        # the paths are the dot separated indices of weighted.model.node()
+        seen = set()
+        found = []
+        stack = [(r, (), "and", options) for r, options in reversed(list(enumerate(self.roots, start=1)))]
+        while stack:
+            r, path, kind, options = stack.pop()
+            if id(options) in seen or id(options) not in self.nodes:
+                continue
+            seen.add(id(options))
+            found.append((r, path, kind, options))
+            if not isinstance(options, charset):
+                child = "or" if kind == "and" else "and"
+                stack.extend((r, path + (i,), child, o) for i, o in reversed(list(enumerate(options))) if not isinstance(o, str))
+        return found
+
+    def summary(self, top=10):
+        # the phases, the strings generated and the top nodes by time, one line each
+        lines = [f"{name} {seconds:.6f}s" for name, seconds in self.phases.items()]
+        lines.append(f"generated {self.generated} strings in {self.seconds:.6f}s, {self.rate():.0f} strings/s")
+        nodes = sorted(self.paths(), key=lambda n: -self.nodes[id(n[3])].seconds)[:top]
+        if len(nodes) > 0:
+            lines.append(f"{'node':<16} {'kind':<4} {'fanout':>8} {'calls':>10} {'yielded':>12} {'seconds':>10}")
+        for r, path, kind, options in nodes:
+            n = self.nodes[id(options)]
+            name = f"{r}:{'.'.join(map(str, path))}" if len(path) > 0 else str(r)
+            lines.append(f"{name:<16} {kind:<4} {n.fanout:>8} {n.calls:>10} {n.yielded:>12} {n.seconds:>10.6f}")
+        return "\n".join(lines)
@@ -1,7 +1,7 @@
 if __debug__:
     import string
 
-    from gen_pass import gen, parse
+    from gen import count, gen, generated_count, nth, parse
 
     def test(spec, parsed_expected="", generated_expected=None, expect_error=False):
         if expect_error is False:
@@ -9,6 +9,15 @@ if __debug__:
             assert parsed == parsed_expected, "".join(map(str, [repr(spec), ":  parse fail, got: ", parsed, " expected: ", parsed_expected]))
             generated = list(gen(parsed))
             assert generated == generated_expected, "".join(map(str, [repr(spec), ": generation fail, got: ", generated, " expected: ", generated_expected]))
+            assert count(parsed) == len(generated), "".join(map(str, [repr(spec), ": count fail, got: ", count(parsed), " expected: ", len(generated)]))
+            assert list(gen(parsed, backend="odometer")) == generated, "".join(map(str, [repr(spec), ": odometer generation fail, got: ", list(gen(parsed, backend="odometer")), " expected: ", generated]))
+            generated_unique = list(gen(parsed, unique=True))
+            assert len(generated_unique) == len(set(generated)) and set(generated_unique) == set(generated), "".join(map(str, [repr(spec), ": unique generation fail, got: ", generated_unique, " expected: ", set(generated)]))
+            for k in range(len(generated)):
+                assert nth(parsed, k) == generated[k], "".join(map(str, [repr(spec), ": nth fail at ", k, ", got: ", nth(parsed, k), " expected: ", generated[k]]))
+                assert list(gen(parsed, start=k)) == generated[k:], "".join(map(str, [repr(spec), ": start fail at ", k]))
+                assert list(gen(parsed, start=k, stop=k + 2)) == generated[k:k + 2], "".join(map(str, [repr(spec), ": slice fail at ", k]))
+                assert list(gen(parsed, start=k, backend="odometer")) == generated[k:], "".join(map(str, [repr(spec), ": odometer start fail at ", k]))
         else:
             exc = None
             try:
@@ -95,6 +104,18 @@ if __debug__:
     test("[\\]]", [["]"]], ["]"])
     test("[a]c]", [["a"], ["c"], ["]"]], ["ac]"])
     test("[a\\]c]", [["a", "]", "c"]], ["a", "]", "c"])
+    test("[a-d]", [["a", "b", "c", "d"]], ["a", "b", "c", "d"])
+    test("[x-za-b]", [["x", "y", "z", "a", "b"]], ["x", "y", "z", "a", "b"])
+    test("[-a]", [["-", "a"]], ["-", "a"])
+    test("[a-]", [["a", "-"]], ["a", "-"])
+    test("[a\\-c]", [["a", "-", "c"]], ["a", "-", "c"])
+    test("[\\x41-\\x43]", [["A", "B", "C"]], ["A", "B", "C"])
+    test("[b-da-c]", [["b", "c", "d", "a"]], ["b", "c", "d", "a"])
+    test("[^aa]", [list(sorted(set(string.printable) - set("a")))], list(sorted(set(string.printable) - set("a"))))
+    test("[^\\d]", [list(sorted(set(string.printable) - set(string.digits)))], list(sorted(set(string.printable) - set(string.digits))))
+    test("[^!-~]", [list(sorted(set(string.whitespace)))], list(sorted(set(string.whitespace))))
+    test("[c-a]", expect_error="out of order range syntax error")
+    test("[\\d-z]", expect_error="class escape range bound syntax error")
     # COUNT
     test("a{", expect_error="unclosed count syntax error")
     test("a{1", expect_error="unclosed count syntax error")
@@ -105,8 +126,6 @@ if __debug__:
     test("a{a,}", expect_error="bad int in count arguments syntax error")
     test("a{,a}", expect_error="bad int in count arguments syntax error")
     test("a{1,0}", expect_error="bad min max count arguments order syntax error")
-    test("a{,}", expect_error="unbound count >=0 syntax error")
-    test("a{1,}", expect_error="unbound count >0 syntax error")
     test("a{0}", [[""]], [""])
     test("a{0,0}", [[""]], [""])
     test("a{1}", [[[["a"]]]], ["a"])
@@ -120,8 +139,6 @@ if __debug__:
     test("a{2,4}", [[[["a"], ["a"], ["a", ""], ["a", ""]]]], ["aaaa", "aaa", "aaa", "aa"])  # should change
     test("[a]{1}", [[[["a"]]]], ["a"])
     test("[ab]{1,2}", [[[["a", "b"], ["a", "b", ""]]]], ["aa", "ab", "a", "ba", "bb", "b"])
-    test("a*", expect_error="unbound count *(>=0) syntax error")
-    test("a+", expect_error="unbound count +(>0) syntax error")
     test("a?", [[[["a"]], ""]], ["a", ""])
     test("a?b?", [[[["a"]], ""], [[["b"]], ""]], ["ab", "a", "b", ""])
     test("a??", [[[[[["a"]], ""]], ""]], ["a", "", ""])  # should change
@@ -146,3 +163,470 @@ if __debug__:
     test("(a)a", [[[["a"]]], ["a"]], ["aa"])  # should change
     test("(a|b)", [[[[[["a"]], [["b"]]]]]], ["a", "b"])  # should change
     test("(a|b)a", [[[[[["a"]], [["b"]]]]], ["a"]], ["aa", "ba"])
+    # COUNT API
+    assert count(parse("\\w{8}")) == 63 ** 8
+    assert count(parse("[ab]{1,2}c?|d{3}")) == 6 * 2 + 1
+    assert count(parse("(a|b)a{0,2}")) == 2 * 4
+    assert count(parse("\\d{100}")) == 10 ** 100
+    assert count([]) == 0
+    assert count([[]]) == 0
+    # NTH API
+    assert nth(parse("\\w{8}"), 0) == "00000000"
+    assert nth(parse("\\w{8}"), -1) == "zzzzzzzz"
+    assert nth(parse("\\w{8}"), 63 ** 7) == "10000000"
+    assert nth(parse("\\d{100}"), 10 ** 99 + 42) == "1" + "0" * 97 + "42"
+    assert list(gen(parse("\\d{100}"), start=-2)) == ["9" * 99 + "8", "9" * 100]
+    assert list(gen(parse("a|b|c"), start=1, stop=-1)) == ["b"]
+    assert list(gen(parse("a|b|c"), start=5)) == []
+    # ODOMETER BACKEND
+    for spec in ("[ab]{1,2}c?|d{3}", "(a|bc|d)[de]?f{0,2}", "((a|b)c|d)e(f|g(h|i))", "\\d(x|\\w)[012]{2}", "[ab]{0,3}(|c||d)", "a||b"):
+        assert list(gen(parse(spec), backend="odometer")) == list(gen(parse(spec))), spec
+        generated = list(gen(parse(spec)))
+        for k in range(0, len(generated), 7):
+            assert list(gen(parse(spec), start=k, stop=k + 9, backend="odometer")) == generated[k:k + 9], (spec, k)
+    assert list(gen([[]], backend="odometer")) == []
+    assert list(gen(parse("a{1000}"), backend="odometer")) == ["a" * 1000]
+    # VECTOR BACKEND
+    import vector
+
+    assert vector.supported(parse("[abc]{3}x\\d{2}")) == (vector.numpy is not None)
+    assert not vector.supported(parse("[ab]{1,2}c"))
+    for spec in ("[abc]{3}x\\d{2}", "(ab|cd){2}[\u00e9\u00e8]", "[\u00e90]", "", "[ab]{1,2}c?|d{3}", "a||b"):
+        generated = list(gen(parse(spec)))
+        assert list(gen(parse(spec), backend="vector")) == generated, spec
+        for k in range(0, len(generated), 7):
+            assert list(gen(parse(spec), start=k, stop=k + 9, backend="vector")) == generated[k:k + 9], (spec, k)
+        chunks = [(bytes(data), n) for data, n in vector.encoded(parse(spec), separator="\0", block_size=5)]  # the blocks reuse their buffer
+        assert b"".join(data for data, _ in chunks) == ("\0".join(generated) + "\0").encode(), spec
+        assert sum(n for _, n in chunks) == len(generated), spec
+    assert list(gen([[]], backend="vector")) == []
+    if vector.numpy is not None:  # the large charsets are tables computed from their ranges
+        parsed = parse("[\u0800-\ud7ff][\U00010000-\U0010ffff]")
+        assert [type(t).__name__ for t in vector.tables(parsed)] == ["ranges_table", "ranges_table"]
+        assert list(gen(parsed, start=10**9, stop=10**9 + 1000, backend="vector")) == list(gen(parsed, start=10**9, stop=10**9 + 1000))
+    # GROUP COUNT
+    test("(ab){0,1}", [[[[[["a"], ["b"]], ""]]]], ["ab", ""])
+    test("(ab){1,2}", [[[[[["a"], ["b"]]], [[["a"], ["b"]], ""]]]], ["abab", "ab"])
+    test("(a|b){0,2}", [[[[[[[["a"]], [["b"]]]], ""], [[[[["a"]], [["b"]]]], ""]]]], ["aa", "ab", "a", "ba", "bb", "b", "a", "b", ""])
+    # the repetitions of a count share the same lists
+    parsed = parse("[^a]{1,500}")
+    assert len(parsed[0][0]) == 500 and len({id(o) for o in parsed[0][0]}) == 2 and count(parsed) == 99 * 100**499
+    # CONSTRAINTS
+    for spec in ("[ab]{1,2}c?|d{3}", "(a|bc|d)[de]?f{0,2}", "((a|b)c|d)e(f|g(h|i))", "[ab]{0,3}(|c||d)", "a||b", ""):
+        generated = list(gen(parse(spec)))
+        for filters in ({"min_len": 3}, {"max_len": 2}, {"min_len": 2, "max_len": 3}, {"prefix": "a"}, {"prefix": "bce"}, {"lower": "b"}, {"upper": "bc"}, {"lower": "aab", "upper": "d"}, {"prefix": "", "lower": "", "upper": ""}):
+            expected = [
+                s
+                for s in generated
+                if filters.get("min_len", 0) <= len(s) <= filters.get("max_len", len(s))
+                and s.startswith(filters.get("prefix", ""))
+                and filters.get("lower", "") <= s
+                and ("upper" not in filters or s < filters["upper"])
+            ]
+            assert list(gen(parse(spec), **filters)) == expected, (spec, filters)
+            assert list(gen(parse(spec), start=1, stop=-1, **filters)) == expected[1:-1], (spec, filters)
+            assert set(gen(parse(spec), unique=True, **filters)) == set(expected), (spec, filters)
+            assert generated_count(parse(spec), **filters) == len(expected), (spec, filters)
+            assert generated_count(parse(spec), unique=True, **filters) == len(set(expected)), (spec, filters)
+    assert list(gen(parse("[0123456789]{6}"), prefix="12345")) == [f"12345{d}" for d in range(10)]
+    assert list(gen(parse("[0123456789]{6}"), lower="999998")) == ["999998", "999999"]
+    assert list(gen(parse("[ab]{0,30}"), max_len=1)) == ["a", "b"] * 30 + [""]
+    assert list(gen(parse("[\u0100-\U0010ffff]b?"), lower="\uffff", upper="\U00010001")) == ["\uffffb", "\uffff", "\U00010000b", "\U00010000"]
+    # counted by length, without generating them
+    assert generated_count(parse("[a-z]{12}"), prefix="ab", lower="abc", upper="abq") == 14 * 26**9
+    assert generated_count(parse("(a|b)*"), max_len=1000, prefix="ab", min_len=999) == 2**998 + 2**997
+    assert generated_count(parse("(a|aa)*"), max_len=200, prefix="a", unique=True) == 200
+    # LENGTH ORDER
+    import collections
+
+    import lengths
+
+    for spec in ("[ab]{1,2}c?|d{3}", "(a|bc|d)[de]?f{0,2}", "((a|b)c|d)e(f|g(h|i))", "[ab]{0,3}(|c||d)", "a||b", "", "a{0,3}b?"):
+        generated = list(gen(parse(spec)))
+        assert list(gen(parse(spec), order="length")) == sorted(generated, key=len), spec
+        assert list(gen(parse(spec), order="length", unique=True)) == sorted(gen(parse(spec), unique=True), key=len), spec
+        assert list(gen(parse(spec), order="shortlex", unique=True)) == sorted(set(generated), key=lambda s: (len(s), s)), spec
+        assert list(gen(parse(spec), order="length", start=1, stop=-1, max_len=2)) == [s for s in sorted(generated, key=len) if len(s) <= 2][1:-1], spec
+        assert lengths.histogram(parse(spec)) == dict(sorted(collections.Counter(map(len, generated)).items())), spec
+    assert list(gen(parse("a{0,3}b?"), order="shortlex", unique=True)) == ["", "a", "b", "aa", "ab", "aaa", "aab", "aaab"]
+    for f in (lambda: list(gen(parse("a?a"), order="shortlex")), lambda: generated_count(parse("a?a"), order="shortlex"), lambda: list(lengths.gen(parse("a*"), "shortlex"))):
+        try:
+            f()
+        except ValueError:
+            pass
+        else:
+            assert False, "shortlex without unique"
+    # UNBOUNDED COUNT
+    import itertools
+    import re
+
+    import unbounded
+    from unbounded import star
+
+    assert parse("a*") == [[[["a"]]]] and isinstance(parse("a*")[0][0][0], star)
+    assert parse("a+") == [[[["a"], ["a"]]]] and isinstance(parse("a+")[0][0][1], star)
+    assert parse("a{2,}") == [[[["a"], ["a"], ["a"]]]] and isinstance(parse("a{2,}")[0][0][2], star)
+    assert parse("a{,}") == parse("a*")
+    assert list(gen(parse("a*"), max_len=3)) == ["aaa", "aa", "a", ""]
+    assert list(itertools.islice(gen(parse("a+")), 4)) == ["a", "aa", "aaa", "aaaa"]
+    assert list(itertools.islice(gen(parse("[ab]*c"), start=3), 4)) == ["aac", "abc", "bac", "bbc"]
+    assert list(gen(parse("(a?)*"), max_len=2)) == ["aa", "a", ""]  # the empty string is not repeated
+    for spec in ("(a|aa)*", "x(a*b)*", "(a?)*", "((a|c)?b?)+", "[ab]*c", "a{2,}b{,2}", "(ab|b)+a?", "(a*)*", "(a+|b)*c+"):
+        for max_len in range(5):
+            generated = list(gen(parse(spec), max_len=max_len))
+            expected = {"".join(t) for n in range(max_len + 1) for t in itertools.product("abcx", repeat=n) if re.fullmatch(spec, "".join(t))}
+            assert set(generated) == expected, (spec, max_len)
+            assert generated_count(parse(spec), max_len=max_len) == len(generated), (spec, max_len)
+            assert list(itertools.islice(gen(parse(spec)), len(generated))) == sorted(generated, key=len) == list(gen(parse(spec), max_len=max_len, order="length")), (spec, max_len)
+            assert list(itertools.islice(gen(parse(spec), order="shortlex", unique=True), len(expected))) == sorted(expected, key=lambda s: (len(s), s)), (spec, max_len)
+    # the expansions are max_len levels deep, walked and indexed without a recursion per level
+    assert generated_count(parse("a*"), max_len=4000) == 4001 and generated_count(parse("[ab]*"), max_len=2000) == 2**2001 - 1
+    deep = list(gen(parse("a*"), max_len=3000))
+    assert len(deep) == 3001 and deep[0] == "a" * 3000 and deep[-1] == ""
+    expanded = unbounded.expand(parse("[ab]*"), 2000)
+    assert nth(expanded, 0) == "a" * 2000 and nth(expanded, -1) == ""
+    assert list(gen(expanded, start=2**2000 - 2, stop=2**2000)) == ["a", "b" + "a" * 1999]
+    assert list(gen(parse("a*b?"), max_len=2000, prefix="a" * 1999)) == ["a" * 2000, "a" * 1999 + "b", "a" * 1999]
+    assert generated_count(parse("(a|aa)*"), max_len=300, unique=True) == 301
+    assert list(itertools.islice(gen(parse("a*")), 600))[-1] == "a" * 599
+    # the constraints matching finitely many strings of an infinite rule stop the generation once they are generated
+    assert list(gen(parse("a*"), prefix="b")) == [] and list(gen(parse("[a-z]*"), prefix="0", unique=True)) == []
+    assert list(gen(parse("[ab]*"), lower="b", upper="ba")) == ["b"] and list(gen(parse("a{2,}|b+"), prefix="bb", upper="bbb", order="shortlex", unique=True)) == ["bb"]
+    assert list(itertools.islice(gen(parse("a*|b{20}c*"), prefix="b", start=1), 2)) == ["b" * 20 + "c", "b" * 20 + "cc"]
+    for f in (count, lambda options: generated_count(options), lambda options: list(gen(options, start=-1))):
+        exc = None
+        try:
+            f(parse("a*b"))
+        except ValueError as e:
+            exc = e
+        assert exc is not None
+    # CHARSETS
+    import charsets
+    import pattern
+    from charsets import charset
+    from gen import BACKENDS
+
+    c = charset("cba")
+    c.add_range(ord("a"), ord("e"))
+    assert list(c) == ["c", "b", "a", "d", "e"] and len(c) == 5 and c[3] == "d" and c[-1] == "e"
+    assert list(c.chars(2)) == ["a", "d", "e"] and list(c.copy(optional=True).chars(4)) == ["e", ""]
+    assert "e" in c and "f" not in c and "" not in c and "" in c.copy(optional=True)
+    assert charsets.ALPHABETS["ascii"].difference(c) == sorted(set(string.printable) - set("abcde"))
+    assert len(charsets.ALPHABETS["latin-1"]) == len(string.printable) + 96
+    charsets.set_alphabet("unicode")
+    try:
+        wide = parse("[^a]\\W")
+        assert count(wide) == 1112063 * 1112001
+        assert nth(wide, 1112001) == "\x01\x00" and nth(wide, -1) == "\U0010ffff\U0010ffff"
+        for backend in BACKENDS:
+            assert list(gen(wide, start=1112000, stop=1112002, backend=backend)) == ["\x00\U0010ffff", "\x01\x00"], backend
+        assert list(gen(wide, start=-2)) == ["\U0010ffff\U0010fffe", "\U0010ffff\U0010ffff"]
+        assert list(gen(parse("x[^a]"), prefix="xé")) == ["xé"]
+        assert list(itertools.islice(gen(parse("[^a]?"), order="length"), 2)) == ["", "\x00"]
+        assert list(itertools.islice(gen(parse("[^a]*")), 3)) == ["", "\x00", "\x01"]
+        assert pattern.compile("[^a]").count() == 1112063
+    finally:
+        charsets.set_alphabet("ascii")
+    assert pattern.compile("[^a]").count() == len(string.printable) - 1
+    # WEIGHTED
+    import json
+    import os
+    import tempfile
+
+    import weighted
+
+    for spec in ("[ab]{1,2}c?|d{3}", "(a|bc|d)[de]?f{0,2}", "((a|b)c|d)e(f|g(h|i))", "a||b", "", "[abc]{3}x(y|z)[ab]{2}"):
+        ranked = list(weighted.gen(parse(spec), with_prob=True))
+        assert collections.Counter(s for s, _ in ranked) == collections.Counter(gen(parse(spec))), spec
+        assert all(p >= q for (_, p), (_, q) in zip(ranked, ranked[1:])) and abs(sum(p for _, p in ranked) - 1) < 1e-9, spec
+    assert list(weighted.gen(parse("[ab]{2}"))) == ["aa", "ab", "ba", "bb"]  # equally likely, the order of the rule
+    parsed = parse("(admin|root)[ae1]{2}")
+    weights = weighted.model(parsed, chars={"e": 5, "a": 3, "1": 2})
+    assert list(weighted.gen(parsed, weights, top=3)) == ["adminee", "rootee", "adminea"]
+    weights.set(weights.node((0, 0, 0)), [1, 3])
+    assert list(weighted.gen(parsed, weights, top=3)) == ["rootee", "rootea", "rootae"]
+    assert list(weighted.gen(parsed, weights, min_prob=0.1)) == ["rootee", "rootea", "rootae"]
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "weights.json"), "w") as f:
+            json.dump({"chars": {"e": 5, "a": 3, "1": 2}, "nodes": {"0.0.0": [1, 3]}}, f)
+        assert list(weighted.gen(parsed, weighted.load(parsed, os.path.join(tmp, "weights.json")), top=3)) == ["rootee", "rootea", "rootae"]
+    assert list(weighted.gen(parse("a?a?"), unique=True)) == ["aa", "a", ""]
+    # the first top * SLACK strings are only duplicates of a few, ranked again with a larger limit
+    assert list(weighted.gen(parse("a?a?a?a?a?a?a?a?"), top=5, unique=True)) == ["a" * n for n in range(8, 3, -1)]
+    ranked = list(weighted.gen(parse("a*"), max_len=3))
+    assert ranked[:2] == ["", "a"] and sorted(ranked) == ["", "a", "aa", "aaa"]
+    assert list(weighted.gen(parse("(a|b)*"), top=4, max_len=3000)) == ["", "a", "b", "aa"]
+    exc = None
+    try:
+        weighted.gen(parse("a*"))
+    except ValueError as e:
+        exc = e
+    assert exc is not None
+    # BATCH
+    import batch
+
+    rules = ["abc\\d{3}", "abc[0-5]\\d{2}", "abd", "x", "ab", "a{0}", "abc\\d{3}"]
+    parsed = [parse(rule) for rule in rules]
+    expected = [s for options in parsed for s in gen(options)]
+    job = batch.batch(rules, parsed)
+    assert job.options[0][0][:2] == [["a"], ["b"]] and len(job.options[0]) == 5  # the first three rules share ab
+    assert list(job.gen()) == expected and job.counts == [1000, 600, 1, 1, 1, 1, 1000] and job.count() == len(expected)
+    assert job.count(unique=True) == len(set(expected)) == 1004 and sorted(job.gen(unique=True)) == sorted(set(expected))
+    done = []
+    assert list(job.gen(start=1500, stop=1603, on_rule=done.append)) == expected[1500:1603] and done == [1, 2, 3, 4]
+    done = []
+    assert list(job.gen(jobs=2, on_rule=done.append)) == expected and done == list(range(len(rules)))
+    job = batch.batch(["a*b", "ab?"], [parse("a*b"), parse("ab?")], max_len=3)
+    assert list(job.gen()) == ["aab", "ab", "b", "ab", "a"] and job.counts == [3, 2]
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "rules.txt"), "w", encoding="utf-8") as f:
+            f.write("abc\\d \n\n[ab]\r\n")
+        assert batch.read_rules(os.path.join(tmp, "rules.txt")) == ["abc\\d ", "[ab]"]
+    # STARTUP
+    import subprocess
+    import sys
+
+    STARTUP_BUDGET_US = 50_000  # import gen and import gen_pass take about 15 ms, leave room for slow machines
+
+    def import_times(module):
+        # cumulative import time of each module imported by module, in a fresh interpreter with a warm bytecode cache
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, PYTHONPYCACHEPREFIX=tmp)
+            env.pop("PYTHONDONTWRITEBYTECODE", None)
+            command = [sys.executable, "-X", "importtime", "-c", f"import {module}"]
+            subprocess.run(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)), check=True, capture_output=True)
+            lines = subprocess.run(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)), check=True, capture_output=True, text=True).stderr.splitlines()
+        times = dict()
+        for line in lines[1:]:
+            _, cumulative, name = line.split("|")
+            times[name.strip()] = int(cumulative)
+        return times
+
+    times = import_times("gen")
+    assert times["gen"] < STARTUP_BUDGET_US, f"import gen took {times['gen']}us, more than the budget of {STARTUP_BUDGET_US}us"
+    assert not {"logging", "tests", "numpy", "concurrent"} & times.keys(), sorted(times)
+    times = import_times("gen_pass")
+    assert times["gen_pass"] < STARTUP_BUDGET_US, f"import gen_pass took {times['gen_pass']}us, more than the budget of {STARTUP_BUDGET_US}us"
+    features = {"batch", "checkpoint", "frontcode", "json", "output", "parallel", "pattern", "random", "sample", "vector", "weighted"}
+    assert not {"logging", "tests", "numpy", "concurrent"} & times.keys() and not features & times.keys(), sorted(times)
+    # STATS
+    import stats
+
+    progress = []
+    s = stats.stats(progress=progress.append, interval=0)
+    with s.phase("parse"):
+        parsed = parse("(ab|c[d-f]){2}\\d{4}")
+    assert list(s.gen(parsed)) == list(gen(parsed)) and s.generated == 160_000 and len(progress) == 160_000 // stats.PROGRESS_EVERY
+    assert set(s.phases) == {"parse"} and s.rate() > 0
+    paths = {(r, path): (kind, s.nodes[id(node)]) for r, path, kind, node in s.paths()}
+    kind, root = paths[1, ()]
+    assert kind == "and" and root.fanout == 2 and root.calls == 1 and root.yielded == 160_000 and root.seconds > 0
+    kind, alternatives = paths[1, (0, 0, 0, 0, 0)]  # ab|c[d-f], shared by the repetitions
+    assert kind == "or" and alternatives.fanout == 2 and alternatives.calls == 1 + 4 and alternatives.yielded == 4 + 4 * 4
+    assert "generated 160000 strings" in s.summary() and len(s.summary(top=3).splitlines()) == 3 + 3
+    s = stats.stats()
+    assert list(s.gen(parsed, start=5, stop=10)) == list(gen(parsed))[5:10] and s.generated == 5 and len(s.nodes) == 0  # only counted
+    # FRONT CODING
+    import frontcode
+
+    for spec, kwargs in [("\\w{2}", {}), ("a?b?(|ab|ac)x{0}[cd]?", {}), ("a?a?\t?b{0,2}", {}), ("(a|b){0}c?", {}), ("x{0}", {}), ("(|a)b*", {"max_len": 4}), ("admin_(root|user)\\d{2}", {"start": 7, "stop": -3}), ("a?a?", {"unique": True})]:
+        parsed = parse(spec)
+        expected = list(gen(parsed, **kwargs))
+        pairs = list(frontcode.diffs(parsed, **kwargs))
+        assert [s for _, s in pairs] == expected, spec
+        assert [k for k, _ in pairs] == [next((i for i, (a, b) in enumerate(zip(p, s)) if a != b), min(len(p), len(s))) for p, s in zip([""] + expected, expected)], spec
+        assert list(frontcode.decode(frontcode.encode(pairs))) == expected, spec
+    assert list(frontcode.diffs(parse("admin_(root|user)\\d")))[9:12] == [(10, "admin_root9"), (6, "admin_user0"), (10, "admin_user1")]
+    assert list(frontcode.encode(frontcode.shared(["ab", "ac", "a", "a\tb", "a\tc", "b"]))) == ["0\tab", "c", "1\t", "1\t\tb", "c", "0\tb"]
+    # BENCHMARK
+    import bench
+
+    results = bench.run({"small": ("[ab]{3}|c", 5)}, repeat=1)
+    metrics = results["results"]["small"]
+    assert metrics["strings"] == 5 and metrics["strings_per_second"] > 0 and metrics["parse_peak_bytes"] > 0 and metrics["gen_peak_bytes"] >= 0
+    assert bench.compare(results, results) == []
+    slower = {"results": {"small": dict(metrics, parse_seconds=metrics["parse_seconds"] + 1, strings_per_second=metrics["strings_per_second"] / 4)}}
+    assert sorted(r[1] for r in bench.compare(slower, results)) == ["parse_seconds", "strings_per_second"]
+    assert bench.compare(results, slower) == []  # faster than the baseline
+    assert [r[1] for r in bench.compare({"results": {"small": dict(metrics, strings=6)}}, results)] == ["strings"]
+    failed = {"results": {"small": {"known_failure": "RecursionError"}}}
+    assert bench.compare(failed, failed) == [] and bench.compare(results, failed) == []  # fixed since the baseline
+    assert [r[1] for r in bench.compare(failed, results)] == ["known_failure"]
+    bench.KNOWN_FAILURES["too deep"] = ("recursive", "RecursionError")  # the parser recurses once per group
+    try:
+        assert bench.run({"too deep": ("(" * 2000 + "a" + ")" * 2000, 1)}, repeat=1)["results"]["too deep"] == {"known_failure": "RecursionError"}
+    finally:
+        del bench.KNOWN_FAILURES["too deep"]
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_baseline.json"), encoding="utf-8") as f:
+        assert set(json.load(f)["results"]) == set(bench.CORPUS)
+    # COMPILED PATTERNS
+    import os
+    import tempfile
+
+    import pattern
+
+    assert pattern.compile("[ab]{2}") is pattern.compile("[ab]{2}")
+    assert pattern.compile("[ab]{2}").count() == 4
+    assert pattern.compile("[ab]{2}").nth(-1) == "bb"
+    assert list(pattern.compile("[ab]{2}")) == ["aa", "ab", "ba", "bb"]
+    assert list(pattern.compile("[ab]{2}").gen(start=1, backend="odometer")) == ["ab", "ba", "bb"]
+    size = pattern.cache_size
+    pattern.set_cache_size(2)
+    p = pattern.compile("a")
+    b = pattern.compile("b")
+    pattern.compile("a")  # a is now the most recently used
+    pattern.compile("c")
+    assert pattern.compile("a") is p
+    assert list(pattern._cache) == [(charsets.alphabet_name, "c"), (charsets.alphabet_name, "a")]  # b was evicted
+    assert pattern.compile("b") is not b and len(pattern._cache) == 2
+    pattern.set_cache_size(size)
+    with tempfile.TemporaryDirectory() as d:
+        pattern.dump([pattern.compile("x|y\\d"), pattern.compile("z?")], os.path.join(d, "compiled"))
+        pattern.clear_cache()
+        loaded = pattern.load(os.path.join(d, "compiled"))
+        assert [p.rule for p in loaded] == ["x|y\\d", "z?"]
+        assert pattern.compile("z?") is loaded[1]
+        assert list(loaded[0]) == list(gen(parse("x|y\\d")))
+    # SAMPLING
+    import collections
+
+    import sample
+    import unique
+
+    parsed = parse("a?a?|b")
+    assert unique.count(parsed) == 4
+    assert [unique.dfa(parsed).nth(k) for k in range(4)] == list(gen(parsed, unique=True))
+    assert sample.random_batch(parsed, 100, seed=42) == sample.random_batch(parsed, 100, seed=42)
+    assert set(sample.random_batch(parsed, 100, seed=42)) == set(gen(parsed))
+    counts = collections.Counter(sample.random_batch(parsed, 10000, seed=42, multiplicity=True))
+    assert 1500 < counts["aa"] < 2500 and 3500 < counts["a"] < 4500  # a is generated twice out of 5
+    counts = collections.Counter(sample.random_batch(parsed, 10000, seed=42))
+    assert all(2000 < counts[g] < 3000 for g in ("aa", "a", "b", ""))
+    assert sorted(sample.sample(parsed, 4, seed=1)) == ["", "a", "aa", "b"]  # distinct strings by default
+    assert sorted(sample.sample(parsed, 5, seed=1, multiplicity=True)) == sorted(gen(parsed))
+    assert len(set(sample.sample(parse("\\w{30}"), 100, seed=1))) == 100
+    # unbounded rules need a max_len, the strings no longer than it are sampled
+    assert len(set(map(len, sample.random_batch(parse("a*b"), 100, seed=1, max_len=6)))) > 1
+    assert all(len(g) <= 6 for g in sample.random_batch(parse("x?(ab|a)*"), 100, seed=1, max_len=6, multiplicity=True))
+    assert sorted(sample.sample(parse("a*b"), 4, seed=1, max_len=4)) == ["aaab", "aab", "ab", "b"]
+    for f in (lambda: sample.sampler(parse("a+")), lambda: unique.count(parse("a*b"))):
+        try:
+            f()
+        except ValueError:
+            pass
+        else:
+            assert False, "infinitely many strings"
+    stream = sample.random_stream(parse("[ab]{2}"), seed=7, batch_size=3)
+    assert [next(stream) for _ in range(10)] == sample.random_batch(parse("[ab]{2}"), 10, seed=7)
+    try:
+        sample.sampler([[]])
+    except ValueError:
+        pass
+    else:
+        assert False, "sampling an empty rule"
+    # OUTPUT
+    import gzip
+    import lzma
+
+    import output
+
+    with tempfile.TemporaryDirectory() as d:
+        generated = list(gen(parse("[ab]{3}|cde")))
+        with output.writer(os.path.join(d, "out")) as w:
+            assert w.write(gen(parse("[ab]{3}|cde"))) == len(generated)
+        with open(os.path.join(d, "out"), "rb") as f:
+            assert f.read() == ("\n".join(generated) + "\n").encode()
+        with output.writer(os.path.join(d, "out.gz"), separator="\0", compress="gzip") as w:
+            w.write(generated)
+        with gzip.open(os.path.join(d, "out.gz"), "rb") as f:
+            assert f.read() == ("\0".join(generated) + "\0").encode()
+        with output.writer(os.path.join(d, "split"), split_size=9, compress="lzma") as w:
+            w.write(["aaa", "bbb", "ccc", "ddddddddddddd", "e"])
+        parts = []
+        for n in range(4):
+            with lzma.open(os.path.join(d, f"split.{n:03d}"), "rb") as f:
+                parts.append(f.read())
+        assert parts == [b"aaa\nbbb\n", b"ccc\n", b"ddddddddddddd\n", b"e\n"]
+        assert not os.path.exists(os.path.join(d, "split.004"))
+        with output.writer(os.path.join(d, "empty"), encoding="utf-16-le") as w:
+            w.write([])
+        assert os.path.getsize(os.path.join(d, "empty")) == 0
+    # RESUME
+    import json
+
+    from gen import enumeration
+
+    generated = list(gen(parse("[ab]{3}|c")))
+    e = enumeration(parse("[ab]{3}|c"))
+    assert [next(e) for _ in range(3)] == generated[:3]
+    cursor = json.loads(json.dumps(e.cursor))
+    assert list(gen(parse("[ab]{3}|c"), resume_from=cursor)) == generated[3:]
+    assert list(gen(parse("[ab]{3}|c"), resume_from=cursor, backend="odometer")) == generated[3:]
+    assert list(gen(parse("[ab]{3}|c"), resume_from=cursor, unique=True)) == generated[3:]
+    e = enumeration(parse("[ab]{3}|c"), start=-2)
+    assert list(e) == generated[-2:] and e.cursor == {"index": len(generated)}
+    with tempfile.TemporaryDirectory() as d:
+        for compress in (None, "gzip"):
+            path = os.path.join(d, f"resume.{compress}")
+            w = output.writer(path, compress=compress)
+            w.write(generated[:3])
+            position = w.sync()
+            w.write(generated[3:5])  # lost when resuming
+            w.flush()
+            with output.writer(path, compress=compress, resume=position) as w:
+                w.write(generated[3:])
+            with (gzip.open if compress else open)(path, "rb") as f:
+                assert f.read() == ("\n".join(generated) + "\n").encode(), compress
+    # UNIQUE
+    assert list(gen(parse("a?a?"), unique=True)) == ["aa", "a", ""]
+    assert list(gen(parse("a??"), unique=True)) == ["a", ""]
+    assert list(gen(parse("(ab|a)b?"), unique=True)) == ["abb", "ab", "a"]
+    assert list(gen(parse("(a|b)(c|d)|ac|a||b"), unique=True)) == ["ac", "ad", "a", "bc", "bd", "b"]
+    assert list(gen(parse("a{0,3}b?"), unique=True, start=2, stop=5)) == ["aab", "aa", "ab"]
+    assert list(gen(parse("a{0,3}b?"), unique=True, start=-3, stop=-1)) == ["a", "b"]
+    assert list(gen(parse("a|b|c"), unique=True, start=-2)) == ["b", "c"]
+    for kwargs in ({"unique": True}, {"unique": True, "prefix": "a"}, {"order": "length"}, {"backend": "odometer"}, {"max_len": 2}):
+        generated = list(gen(parse("(a|ab)?b{0,2}"), **kwargs))
+        for start, stop in ((-2, None), (None, -1), (-3, -1), (1, -1), (-1, 0)):
+            assert list(gen(parse("(a|ab)?b{0,2}"), start=start, stop=stop, **kwargs)) == generated[start:stop], (kwargs, start, stop)
+    assert list(gen([[]], unique=True)) == []
+    # the transitions of the automaton are ranges, overlapping ones are cut where they start and end
+    parsed = parse("[\u0100-\u0300]|[\u0200-\u0500]x|\u0250")
+    generated = list(gen(parsed, unique=True))
+    assert len(generated) == len(set(gen(parsed))) == 0x201 + 0x301 and generated[0xFE:0x102] == ["\u01fe", "\u01ff", "\u0200x", "\u0200"]
+    parsed = parse("[\u0100-\U0010ffff]{2}|[a-z]\u0101")
+    assert generated_count(parsed, unique=True) == (0x10FFFF - 0xFF) ** 2 + 26 and nth(parsed, -1) == "z\u0101"
+    # by length the characters of a range are walked one at a time, the first strings come without the others
+    assert list(itertools.islice(gen(parsed, order="shortlex", unique=True), 3)) == ["a\u0101", "b\u0101", "c\u0101"]
+    assert list(itertools.islice(gen(parsed, order="length", unique=True), 2)) == ["\u0100\u0100", "\u0100\u0101"]
+    assert generated_count(parsed, unique=True, lower="\u0200", upper="\u0300") == 0x100 * (0x10FFFF - 0xFF)
+    for k in (-4, 3):
+        try:
+            nth(parse("a|b|c"), k)
+        except IndexError:
+            pass
+        else:
+            assert False, k
+    if __name__ == "__main__":  # only from the main process, worker processes may import this module
+        # PARALLEL
+        import parallel
+
+        parsed = parse("[ab]{3}\\d{2}|c{0,3}")
+        assert list(parallel.gen(parsed, jobs=2, chunk_size=7)) == list(gen(parsed))
+        assert list(parallel.gen(parsed, jobs=2, chunk_size=7, start=10, stop=-10)) == list(gen(parsed))[10:-10]
+        assert sorted(parallel.gen(parsed, jobs=2, chunk_size=7, ordered=False)) == sorted(gen(parsed))
+        chunks = list(parallel.encoded(parsed, jobs=2, chunk_size=7, start=3, encoding="utf-16-le", separator="\0"))
+        assert all(isinstance(data, bytes) for data, _ in chunks) and sum(n for _, n in chunks) == len(list(gen(parsed))) - 3
+        assert b"".join(data for data, _ in chunks).decode("utf-16-le") == "".join(g + "\0" for g in list(gen(parsed))[3:])
+        # with max_len the repetitions without a maximum are expanded and the longer strings dropped, like gen()
+        for spec in ("(ab|c)*d?", "a*bbbb|[ab]{0,2}"):
+            generated = list(gen(parse(spec), max_len=3))
+            assert list(parallel.gen(parse(spec), jobs=2, chunk_size=4, max_len=3)) == generated, spec
+            assert list(parallel.gen(parse(spec), jobs=2, chunk_size=4, start=2, stop=-2, max_len=3)) == generated[2:-2], spec
+        try:
+            parallel.encoded(parse("a*"), jobs=2)
+            assert False, "infinitely many strings without a max_len"
+        except ValueError:
+            pass
+        measured = bench.scaling("[ab]{3}", 100, (1, 2), repeat=1)
+        assert measured["strings"] == 8 and set(measured["speedup"]) == {"1", "2"} and measured["speedup"]["1"] == 1.0
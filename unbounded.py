@@ -0,0 +1,192 @@
+import lengths
+from charsets import charset
+
+WINDOW = 16  # max length of the strings of the first expansion of an infinite rule, doubled for each next one
+
+
+class star(list):
+    # an or node generating its strings repeated any number of times one after the other, none included
+    # from *, + and counts without a maximum
+    def __repr__(self):
+        return f"star({list.__repr__(self)})"
+
+
+class repeat(list):
+    # an or node generating the strings of the or node option repeated at most count times one after the other,
+    # none included, the expansion of a star for a max_len: [[option, rest], ""] with rest the repeat of at most
+    # count - 1 of them, [""] for none. As lists it is count levels deep, so the indexes and the walks loop over the
+    # levels instead of recursing into rest
+    def __init__(self, option, count, rest):
+        super().__init__([[option, rest], ""])
+        self.option = option
+        self.count = count
+        self.rest = rest
+
+    def __repr__(self):
+        return f"repeat({self.option!r}, {self.count})"
+
+
+def repeated(option, count):
+    # the repeat of option at most count times, built from the innermost level
+    r = [""]
+    for n in range(1, count + 1):
+        r = repeat(option, n, r)
+    return r
+
+
+def unbounded(options, seen=None):
+    # whether some repetition has no maximum
+    if isinstance(options, (str, charset)):
+        return False
+    if isinstance(options, star):
+        return True
+    if isinstance(options, repeat):
+        return unbounded(options.option, seen)  # the levels repeat the same option
+    if seen is None:
+        seen = set()
+    if id(options) in seen:
+        return False
+    seen.add(id(options))
+    return any(unbounded(o, seen) for o in options)
+
+
+# (generates some string, generates a non empty string, generates infinitely many strings) for each node
+class analysis:
+    def __init__(self):
+        self.ands = dict()  # id(and node) -> info
+        self.ors = dict()  # id(or node) -> info
+
+    def and_info(self, options):
+        if isinstance(options, str):
+            return (True, len(options) > 0, False)
+        info = self.ands.get(id(options))
+        if info is None:
+            infos = [self.or_info(o) for o in options]
+            live = len(options) > 0 and all(i[0] for i in infos)  # an empty and generates nothing
+            info = (live, live and any(i[1] for i in infos), live and any(i[2] for i in infos))
+            self.ands[id(options)] = info
+        return info
+
+    def or_info(self, options):
+        if isinstance(options, str):
+            return (True, len(options) > 0, False)
+        info = self.ors.get(id(options))
+        if info is None:
+            if isinstance(options, charset):
+                info = (len(options) > 0, len(options) > options.optional, False)
+                self.ors[id(options)] = info
+                return info
+            if isinstance(options, repeat):
+                i = self.or_info(options.option)
+                info = self.ors[id(options)] = (True, i[1], i[2])
+                return info
+            infos = [self.and_info(o) for o in options]
+            if isinstance(options, star):
+                nonempty = any(i[1] for i in infos)
+                info = (True, nonempty, nonempty)
+            else:
+                info = (any(i[0] for i in infos), any(i[1] for i in infos), any(i[2] for i in infos))
+            self.ors[id(options)] = info
+        return info
+
+
+def infinite(options):
+    return analysis().and_info(options)[2]
+
+
+def positions(options, counted=None):
+    # the number of characters of the rule, the ones of a repetition without a maximum once: an automaton of the
+    # rule needs no more states than that plus one
+    if isinstance(options, str):
+        return len(options)
+    if isinstance(options, charset):
+        return 1
+    if counted is None:
+        counted = dict()  # id(node) -> positions, the shared nodes of the counts are counted once per repetition
+    n = counted.get(id(options))
+    if n is None:
+        n = counted[id(options)] = sum(positions(o, counted) for o in options)
+    return n
+
+
+# replaces the repetitions without a maximum by finite ones, generating the same strings up to max_len characters long
+# each string of a repetition is generated once per way of splitting it in non empty repeated strings,
+# the longest repetitions first like the counts
+class expander:
+    def __init__(self, max_len):
+        self.max_len = max_len
+        self.ands = dict()  # id(and node) -> expanded and node, the same node when it has no repetition to expand
+        self.ors = dict()  # id(or node) -> expanded or node
+        self.index = None  # lengths of the repeated node being expanded
+
+    def expand_and(self, options):
+        if isinstance(options, str):
+            return options
+        expanded = self.ands.get(id(options))
+        if expanded is None:
+            items = [self.expand_or(o) for o in options]
+            expanded = options if all(a is b for a, b in zip(items, options)) else items
+            self.ands[id(options)] = expanded
+        return expanded
+
+    def expand_or(self, options):
+        if isinstance(options, (str, charset)):
+            return options
+        expanded = self.ors.get(id(options))
+        if expanded is None:
+            if isinstance(options, star):
+                expanded = self.repeat(options)
+            else:
+                items = [self.expand_and(o) for o in options]
+                expanded = options if all(a is b for a, b in zip(items, options)) else items
+            self.ors[id(options)] = expanded
+        return expanded
+
+    def repeat(self, options):
+        option = [self.expand_and(o) for o in options]
+        self.index = lengths.length_index([option], max_len=self.max_len)
+        shortest = min((length for length in self.index.total if length > 0), default=None)
+        if shortest is None:
+            return [""]
+        # repeating the empty string would only generate duplicates
+        return repeated(self.nonempty_or(option), self.max_len // shortest)
+
+    # nodes generating the non empty strings of a node, None when there is none
+    def nonempty_and(self, options, i=0):
+        if isinstance(options, str):
+            return options if len(options) > 0 else None
+        if i >= len(options):
+            return None
+        alternatives = []
+        head = self.nonempty_or(options[i])
+        if head is not None:
+            alternatives.append([head, *options[i + 1 :]])
+        if 0 in self.index.or_histogram(options[i]):  # empty head, the rest must not be
+            rest = self.nonempty_and(options, i + 1)
+            if rest is not None:
+                alternatives.append(rest)
+        if len(alternatives) == 0:
+            return None
+        return alternatives[0] if len(alternatives) == 1 else [alternatives]
+
+    def nonempty_or(self, options):
+        if isinstance(options, str):
+            return options if len(options) > 0 else None
+        if isinstance(options, charset):
+            return options.copy(optional=False) if len(options) > options.optional else None
+        alternatives = [a for a in map(self.nonempty_and, options) if a is not None]
+        return alternatives if len(alternatives) > 0 else None
+
+
+def expand(options, max_len):
+    return expander(max_len).expand_and(options)
+
+
+# the strings of a rule generating infinitely many of them, one length after the other
+# the repetitions are expanded again for the strings up to WINDOW, 2 * WINDOW, 4 * WINDOW, ... characters long
+def gen(options, order="length", unique=False, min_len=None):
+    low = 0 if min_len is None else min_len
+    high = max(low, WINDOW)
+    while True:
+        yield from lengths.gen(expand(options, high), order, unique=unique, min_len=low, max_len=high)
+        low, high = high + 1, high * 2
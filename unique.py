@@ -0,0 +1,303 @@
+from bisect import bisect_left
+from itertools import accumulate
+
+import unbounded
+from charsets import charset
+
+
+class nfa:
+    def __init__(self, options):
+        self.edges = []  # state -> [(first, last, state, order)], an edge for each range of codepoints
+        self.epsilons = []  # state -> [states]
+        self.orders = 0  # creation order of the next character, to keep the order of the rule
+        self.start = self.state()
+        self.accept = self.build_and(options, self.start)
+
+    def state(self):
+        self.edges.append([])
+        self.epsilons.append([])
+        return len(self.edges) - 1
+
+    def edge(self, s, first, last, n):
+        # the characters of the range are ordered after each other, like if they were added one at a time
+        self.edges[s].append((first, last, n, self.orders))
+        self.orders += last - first + 1
+
+    def build_str(self, options, s):
+        e = self.state()
+        if len(options) == 0:
+            self.epsilons[s].append(e)
+            return e
+        for c in options[:-1]:
+            n = self.state()
+            self.edge(s, ord(c), ord(c), n)
+            s = n
+        self.edge(s, ord(options[-1]), ord(options[-1]), e)
+        return e
+
+    def build_and(self, options, s):
+        if isinstance(options, str):
+            return self.build_str(options, s)
+        if len(options) == 0:
+            return self.state()  # an empty and generates nothing, its end is unreachable
+        for o in options:
+            s = self.build_or(o, s)
+        return s
+
+    def build_or(self, options, s):
+        if isinstance(options, str):
+            return self.build_str(options, s)
+        if isinstance(options, unbounded.repeat):
+            return self.build_repeat(options, s)
+        if isinstance(options, unbounded.star):
+            raise ValueError("the rule generates infinitely many strings, give a max_len")
+        e = self.state()
+        if isinstance(options, charset):
+            for first, last in options.ranges:
+                self.edge(s, first, last, e)
+            if options.optional:
+                self.epsilons[s].append(e)
+            return e
+        for o in options:
+            self.epsilons[self.build_and(o, s)].append(e)
+        return e
+
+    def build_repeat(self, options, s):
+        # the states build_or() would make for the levels of a repeat, in the same order, without a recursion per
+        # level: the option of each level down to the innermost one, then the end of each level from the innermost
+        levels = []  # (start, end) of the levels
+        while isinstance(options, unbounded.repeat):
+            levels.append((s, self.state()))
+            s = self.build_or(options.option, s)
+            options = options.rest
+        e = self.build_or(options, s)
+        for s, end in reversed(levels):
+            self.epsilons[e].append(end)  # the option followed by the next level
+            self.epsilons[self.build_str("", s)].append(end)  # or nothing
+            e = end
+        return e
+
+    def closure(self, states):
+        closed = set(states)
+        todo = list(states)
+        while todo:
+            for n in self.epsilons[todo.pop()]:
+                if n not in closed:
+                    closed.add(n)
+                    todo.append(n)
+        return frozenset(closed)
+
+
+# the parsed structure is always finite, so the automaton is acyclic and a depth first walk of the
+# deterministic automaton visits each distinct string exactly once
+class dfa:
+    def __init__(self, options):
+        self.nfa = nfa(options)
+        self.start = self.nfa.closure((self.nfa.start,))
+        self.transitions = dict()  # dfa state -> [(char, dfa state)], built lazily
+        self.dead = set()  # dfa states from which no string is accepted
+        self._counts = None
+        self._lengths = None
+        self._histograms = dict()  # max_len -> histograms
+        self._within = dict()  # (state, max_len) -> number of strings no longer than each length up to max_len
+
+    def accepting(self, state):
+        return self.nfa.accept in state
+
+    def next(self, state):
+        # [(first, last, dfa state)] ranges of codepoints, in the order of the rule: the edges of the nfa states are
+        # cut where any of them starts or ends, each piece going to the closure of the edges covering it
+        transitions = self.transitions.get(state)
+        if transitions is None:
+            edges = [e for s in state for e in self.nfa.edges[s]]
+            points = sorted({first for first, _, _, _ in edges} | {last + 1 for _, last, _, _ in edges})
+            pieces = dict()  # index of the piece -> (order of its first character, nfa states)
+            for first, last, n, order in edges:
+                for i in range(bisect_left(points, first), bisect_left(points, last + 1)):
+                    key = order + points[i] - first
+                    if i in pieces:
+                        pieces[i] = (min(key, pieces[i][0]), pieces[i][1] | {n})
+                    else:
+                        pieces[i] = (key, {n})
+            closures = dict()
+            transitions = []
+            for i, (key, ns) in sorted(pieces.items(), key=lambda p: p[1][0]):
+                ns = frozenset(ns)
+                if ns not in closures:
+                    closures[ns] = self.nfa.closure(ns)
+                first, last, n = points[i], points[i + 1] - 1, closures[ns]
+                if len(transitions) > 0 and transitions[-1][1] + 1 == first and transitions[-1][2] == n:
+                    first = transitions.pop()[0]  # the same target right after, in order
+                transitions.append((first, last, n))
+            self.transitions[state] = transitions
+        return transitions
+
+    def chars(self, state):
+        # the (char, dfa state) transitions one character at a time
+        for first, last, n in self.next(state):
+            for c in range(first, last + 1):
+                yield chr(c), n
+
+    def counts(self):
+        # number of distinct strings accepted from each reachable state, builds the whole automaton
+        if self._counts is None:
+            counts = dict()
+            stack = [self.start]
+            while stack:
+                state = stack[-1]
+                if state in counts:
+                    stack.pop()
+                    continue
+                pending = [n for _, _, n in self.next(state) if n not in counts]
+                if len(pending) > 0:
+                    stack.extend(pending)
+                    continue
+                counts[state] = int(self.accepting(state)) + sum((last - first + 1) * counts[n] for first, last, n in self.next(state))
+                stack.pop()
+            self._counts = counts
+        return self._counts
+
+    def count(self):
+        return self.counts()[self.start]
+
+    def within(self, state, max_len):
+        # number of distinct strings accepted from state, no longer than max_len
+        return self.counts()[state] if max_len is None else self.cumulated(state, max_len)[max_len]
+
+    def cumulated(self, state, max_len):
+        # number of distinct strings accepted from state no longer than each length up to max_len
+        cumulated = self._within.get((state, max_len))
+        if cumulated is None:
+            histogram = self.histograms(max_len)[state]
+            cumulated = self._within[state, max_len] = list(accumulate(histogram.get(length, 0) for length in range(max_len + 1)))
+        return cumulated
+
+    def nth(self, k, max_len=None):
+        # the k-th string in the same order as gen(), among the ones no longer than max_len
+        state = self.start
+        generated = []
+        while True:
+            left = None if max_len is None else max_len - len(generated) - 1  # length left after the next character
+            for first, last, n in self.next(state):
+                if max_len is None:
+                    m = self.counts()[n]
+                else:
+                    m = self.cumulated(n, max_len)[left] if left >= 0 else 0
+                if k < (last - first + 1) * m:
+                    c, k = divmod(k, m)
+                    generated.append(chr(first + c))
+                    state = n
+                    break
+                k -= (last - first + 1) * m
+            else:
+                return "".join(generated)
+
+    def lengths(self):
+        # lengths of the distinct strings accepted from each reachable state, builds the whole automaton
+        if self._lengths is None:
+            lengths = dict()
+            stack = [self.start]
+            while stack:
+                state = stack[-1]
+                if state in lengths:
+                    stack.pop()
+                    continue
+                pending = [n for _, _, n in self.next(state) if n not in lengths]
+                if len(pending) > 0:
+                    stack.extend(pending)
+                    continue
+                accepted = {0} if self.accepting(state) else set()
+                for _, _, n in self.next(state):
+                    accepted.update(length + 1 for length in lengths[n])
+                lengths[state] = frozenset(accepted)
+                stack.pop()
+            self._lengths = lengths
+        return self._lengths
+
+    def histograms(self, max_len=None):
+        # number of distinct strings of each length up to max_len accepted from each reachable state, builds the
+        # whole automaton
+        if max_len in self._histograms:
+            return self._histograms[max_len]
+        histograms = dict()
+        stack = [self.start]
+        while stack:
+            state = stack[-1]
+            if state in histograms:
+                stack.pop()
+                continue
+            pending = [n for _, _, n in self.next(state) if n not in histograms]
+            if len(pending) > 0:
+                stack.extend(pending)
+                continue
+            histogram = {0: 1} if self.accepting(state) else dict()
+            for first, last, n in self.next(state):
+                for length, k in histograms[n].items():
+                    if max_len is None or length < max_len:
+                        histogram[length + 1] = histogram.get(length + 1, 0) + (last - first + 1) * k
+            histograms[state] = histogram
+            stack.pop()
+        self._histograms[max_len] = histograms
+        return histograms
+
+    def gen_length(self, length, sort=False):
+        # the strings of exactly this length, in the order of the rule or sorted
+        lengths = self.lengths()
+        if length not in lengths[self.start]:
+            return
+        # (state, prefix, first, last): the strings continuing prefix with the characters first to last and then from
+        # state, the characters of a range are taken one at a time rather than all pushed at once
+        stack = [(self.start, "", None, None)]
+        while stack:
+            state, prefix, first, last = stack.pop()
+            if first is not None:
+                if first < last:
+                    stack.append((state, prefix, first + 1, last))
+                prefix += chr(first)
+            left = length - len(prefix)
+            if left == 0:
+                yield prefix
+                continue
+            transitions = sorted(self.next(state)) if sort else self.next(state)
+            for first, last, n in reversed(transitions):
+                if left - 1 in lengths[n]:
+                    stack.append((n, prefix, first, last))
+
+    def gen_by_length(self, sort=False, min_len=0, max_len=None):
+        for length in sorted(self.lengths()[self.start]):
+            if min_len <= length and (max_len is None or length <= max_len):
+                yield from self.gen_length(length, sort)
+
+    def gen(self):
+        # strings extending a prefix come before the prefix itself, like the greedy counts of gen()
+        stack = [(self.start, "", self.chars(self.start), 0)]
+        generated = 0
+        while stack:
+            state, prefix, transitions, before = stack[-1]
+            for c, n in transitions:
+                if n in self.dead:
+                    continue
+                if len(self.next(n)) == 0:  # leaf, no need to go through the stack
+                    if self.accepting(n):
+                        generated += 1
+                        yield prefix + c
+                    else:
+                        self.dead.add(n)
+                    continue
+                stack.append((n, prefix + c, self.chars(n), generated))
+                break
+            else:
+                stack.pop()
+                if self.accepting(state):
+                    generated += 1
+                    yield prefix
+                elif generated == before:
+                    self.dead.add(state)
+
+
+def gen(options):
+    return dfa(options).gen()
+
+
+def count(options):
+    return dfa(options).count()
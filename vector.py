@@ -0,0 +1,177 @@
+import codecs
+from itertools import accumulate, islice
+
+from charsets import charset
+from gen import gen as gen_strings, size_index
+from unbounded import star
+
+try:
+    import numpy
+except ImportError:  # optional, everything falls back to gen() without it
+    numpy = None
+
+BLOCK_SIZE = 1 << 16  # strings generated at once
+TABLE_LIMIT = 1 << 12  # max number of values of a position materialized from a nested group
+INDEX_LIMIT = 1 << 63  # the indices are computed in int64
+
+
+def positions(options, columns=None):
+    # flattens a fixed width and into its positions, each one the list of its values in generation order
+    # returns None when some part is not a single set of values
+    if columns is None:
+        columns = []
+    if isinstance(options, str):
+        columns.append([options])
+        return columns
+    if len(options) == 0:
+        return None  # an empty and generates nothing
+    for o in options:
+        if isinstance(o, str):
+            columns.append([o])
+        elif isinstance(o, star):
+            return None
+        elif isinstance(o, charset):
+            columns.append(o)
+        elif all(isinstance(oo, str) for oo in o):
+            columns.append(o)
+        elif len(o) == 1:  # group
+            if positions(o[0], columns) is None:
+                return None
+        else:
+            # alternatives, materialized when small enough, they still have to be of the same width
+            if size_index([o]).total > TABLE_LIMIT:
+                return None
+            columns.append(list(gen_strings([o])))
+    return columns
+
+
+# the rows of a table of the characters of a charset, computed from its ranges instead of materialized, for the
+# encodings where the bytes of a character are computed from its codepoint
+class ranges_table:
+    LEADS = (0, 0xC0, 0xE0, 0xF0)  # first byte of the utf-8 sequences of each width
+
+    def __init__(self, chars, width):
+        self.firsts = numpy.array([first for first, _ in chars.ranges], dtype=numpy.int64)
+        self.offsets = numpy.array(list(accumulate((last - first + 1 for first, last in chars.ranges), initial=0))[:-1], dtype=numpy.int64)
+        self.size = len(chars)
+        self.shape = (self.size, width)
+
+    @staticmethod
+    def of(chars, encoding):
+        # the table of chars, None when the encoding or the width of its characters doesn't allow it
+        if chars.optional or len(chars) == 0:
+            return None
+        name = codecs.lookup(encoding).name
+        limit = {"ascii": 0x80, "iso8859-1": 0x100, "utf-8": 0x110000}.get(name)
+        if limit is None or ord(chars.highest()) >= limit or any(first <= 0xDFFF and 0xD800 <= last for first, last in chars.ranges):
+            return None  # other encodings, or characters they can't encode
+        widths = {len(chr(c).encode(name)) for first, last in chars.ranges for c in (first, last)}
+        if len(widths) != 1:
+            return None  # variable width
+        return ranges_table(chars, widths.pop())
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, digit):
+        # the rows of the characters of indices digit, an int or an array of them
+        digit = numpy.asarray(digit, dtype=numpy.int64)
+        r = numpy.searchsorted(self.offsets, digit, side="right") - 1
+        codepoint = self.firsts[r] + digit - self.offsets[r]
+        width = self.shape[1]
+        if width == 1:
+            return codepoint.astype(numpy.uint8)[..., None]
+        rows = [(codepoint >> (6 * (width - 1))) | self.LEADS[width - 1]]  # the utf-8 bytes, 6 bits in each continuation byte
+        rows.extend(((codepoint >> (6 * k)) & 0x3F) | 0x80 for k in range(width - 2, -1, -1))
+        return numpy.stack(rows, axis=-1).astype(numpy.uint8)
+
+
+# one (values, bytes) uint8 table per position of a fixed width pattern, None when it can not be generated by blocks,
+# the charsets are tables computed from their ranges when the encoding allows it
+def tables(options, encoding="utf-8"):
+    if numpy is None:
+        return None
+    columns = positions(options)
+    if columns is None or any(len(c) == 0 for c in columns):
+        return None
+    result = []
+    for c in columns:
+        if isinstance(c, charset):
+            table = ranges_table.of(c, encoding)
+            if table is not None:
+                result.append(table)
+                continue
+        values = [v.encode(encoding) for v in c]
+        width = len(values[0])
+        if any(len(v) != width for v in values):
+            return None  # variable width
+        result.append(numpy.frombuffer(b"".join(values), dtype=numpy.uint8).reshape(len(values), width))
+    return result
+
+
+def supported(options, encoding="utf-8"):
+    t = tables(options, encoding)
+    return t is not None and size_index(options).total < INDEX_LIMIT
+
+
+# yields (n, width + len(separator)) uint8 arrays with the encoded strings gen() would yield, each row followed by separator
+# the same buffer is reused for the next block, copy it to keep it
+def blocks(options, start=None, stop=None, encoding="utf-8", separator="\n", block_size=BLOCK_SIZE):
+    t = tables(options, encoding)
+    total = size_index(options).total
+    if t is None or total >= INDEX_LIMIT:
+        raise ValueError("pattern can not be generated by blocks, it needs numpy and a fixed width")
+    start, stop, _ = slice(start, stop).indices(total)
+    if start >= stop:
+        return
+    separator = separator.encode(encoding)
+    width = sum(table.shape[1] for table in t)
+    buffer = numpy.empty((min(block_size, stop - start), width + len(separator)), dtype=numpy.uint8)
+    buffer[:, width:] = numpy.frombuffer(separator, dtype=numpy.uint8)
+    variable = []  # (column, table) of the positions with more than one value, constant ones are filled once
+    column = 0
+    for table in t:
+        if len(table) == 1:
+            buffer[:, column : column + table.shape[1]] = table[0]
+        else:
+            variable.append((column, table))
+        column += table.shape[1]
+    for first in range(start, stop, len(buffer)):
+        n = min(len(buffer), stop - first)
+        block = buffer[:n]
+        index = numpy.arange(first, first + n, dtype=numpy.int64)
+        for column, table in reversed(variable):  # mixed radix digits, last position varying fastest
+            index, digit = numpy.divmod(index, len(table))
+            block[:, column : column + table.shape[1]] = table[digit]
+        yield block
+
+
+# yields (bytes like, number of strings) chunks of the encoded strings each followed by separator, without creating them
+# when the pattern is supported, and encoding the strings of gen() otherwise
+def encoded(options, start=None, stop=None, encoding="utf-8", separator="\n", block_size=BLOCK_SIZE):
+    if supported(options, encoding):
+        for block in blocks(options, start, stop, encoding, separator, block_size):
+            yield block.reshape(-1).data, len(block)
+        return
+    strings = gen_strings(options, start=start, stop=stop)
+    while True:
+        batch = list(islice(strings, block_size))
+        if len(batch) == 0:
+            return
+        batch.append("")  # terminate the last string too
+        yield separator.join(batch).encode(encoding), len(batch) - 1
+
+
+# same strings as gen(), decoded from the blocks
+def gen(options, start=None, stop=None, block_size=BLOCK_SIZE):
+    if not supported(options):
+        yield from gen_strings(options, start=start, stop=stop)
+        return
+    for block in blocks(options, start, stop, separator="", block_size=block_size):
+        width = block.shape[1]
+        if width == 0:
+            yield from [""] * len(block)
+            continue
+        data = block.tobytes()
+        for i in range(0, len(data), width):
+            yield data[i : i + width].decode()
@@ -0,0 +1,308 @@
+import heapq
+import json
+from itertools import islice
+from math import exp, inf, log
+
+import unbounded
+from charsets import charset
+
+MERGE_LIMIT = 1 << 12  # max number of strings ranked at once when merging consecutive sets
+SLACK = 2  # with filtered strings the nodes rank top * SLACK strings, then twice more each time it is not enough
+
+
+# weights of the alternatives of the or nodes of a parsed rule, each alternative is picked with a probability
+# proportional to its weight among the alternatives of its or node
+# the single character alternatives (the characters of the sets) weigh chars[c], all the others default
+class model:
+    def __init__(self, options, chars=None, default=1.0):
+        self.options = options  # keep a reference so that the node ids stay valid
+        self.chars = dict() if chars is None else dict(chars)
+        self.default = default
+        self.nodes = dict()  # id(or node) -> weights of its alternatives, overriding the ones above
+
+    def set(self, node, weights):
+        # the node is shared by all the repetitions of a count, they all get the weights
+        if isinstance(node, (str, charset)) or len(weights) != len(node):
+            raise ValueError(f"expected an or node and one weight per alternative, got {len(weights)} weights for {node!r}")
+        self.nodes[id(node)] = list(weights)
+
+    def node(self, path):
+        # the or node at this path of indices from the parsed rule, alternately in an and and in an or node
+        node = self.options
+        for i in path:
+            if isinstance(node, (str, charset)) or not -len(node) <= i < len(node):
+                raise ValueError(f"no node at {path!r}")
+            node = node[i]
+        if len(path) % 2 == 0 or isinstance(node, (str, charset)):
+            raise ValueError(f"the node at {path!r} is not an or node with alternatives")
+        return node
+
+    def weight(self, option):
+        if isinstance(option, str) and len(option) == 1:
+            return self.chars.get(option, self.default)
+        return self.default
+
+    def weights(self, options):
+        w = self.nodes.get(id(options))
+        return [self.weight(o) for o in options] if w is None else w
+
+
+def load(options, file):
+    # sidecar json weights file: {"default": 1, "chars": {"e": 12.7, ...}, "nodes": {"0.1.0": [3, 1], ...}}
+    # the nodes are given by the dot separated path of model.node()
+    with open(file, encoding="utf-8") as f:
+        spec = json.load(f)
+    m = model(options, chars=spec.get("chars"), default=spec.get("default", 1.0))
+    for path, weights in spec.get("nodes", dict()).items():
+        m.set(m.node(tuple(map(int, path.split(".")))), weights)
+    return m
+
+
+# the (log probability, string) of a node in non increasing probability, computed as far as they are asked for
+class ranked:
+    __slots__ = ("items", "source")
+
+    def __init__(self, source):
+        self.items = []
+        self.source = source
+
+    def get(self, i):
+        while len(self.items) <= i and self.source is not None:
+            item = next(self.source, None)
+            if item is None:
+                self.source = None
+            else:
+                self.items.append(item)
+        return self.items[i] if i < len(self.items) else None
+
+
+# best first search over the parsed rule: each node ranks its strings lazily from the rankings of its children,
+# and no node computes more than limit strings or strings less likely than min_logp, none of them could be used
+class ranker:
+    def __init__(self, model, limit=None, min_logp=-inf):
+        self.model = model
+        self.limit = limit
+        self.min_logp = min_logp
+        self.ands = dict()  # id(and node) -> ranked
+        self.ors = dict()  # id(or node) -> ranked
+
+    def bounded(self, items):
+        for n, item in enumerate(items):
+            if (self.limit is not None and n >= self.limit) or item[0] < self.min_logp:
+                return
+            yield item
+
+    def and_ranked(self, options):
+        if isinstance(options, str):
+            return ranked(iter(((0.0, options),)))
+        r = self.ands.get(id(options))
+        if r is None:
+            r = self.ands[id(options)] = ranked(self.bounded(self.and_gen(options)))
+        return r
+
+    def or_ranked(self, options):
+        if isinstance(options, str):
+            return ranked(iter(((0.0, options),)))
+        r = self.ors.get(id(options))
+        if r is None:
+            if isinstance(options, charset):
+                source = self.charset_gen(options)
+            elif isinstance(options, unbounded.repeat):
+                source = self.repeat_gen(options)
+            else:
+                source = self.or_gen(options)
+            r = self.ors[id(options)] = ranked(self.bounded(source))
+        return r
+
+    def and_gen(self, options):
+        # product of the rankings of the children, each tuple of ranks is reached from a single parent,
+        # the same one with its last non zero rank decremented, which is at least as likely
+        factors = self.factors(options)
+        children = self.merge([self.or_ranked(o) for o in factors], factors)
+        if len(children) == 0 or any(c.get(0) is None for c in children):
+            return  # an empty and generates nothing
+        items = [c.items for c in children]
+        heap = [(-sum(i[0][0] for i in items), (0,) * len(children), 0)]
+        limit, min_logp = self.limit, self.min_logp
+        popped = 0
+        while heap:
+            cost, ranks, last = heapq.heappop(heap)
+            yield (-cost, "".join([i[k][1] for i, k in zip(items, ranks)]))
+            popped += 1
+            for j in range(last, len(children)):
+                k = ranks[j] + 1
+                if k < len(items[j]) or children[j].get(k) is not None:
+                    next_cost = cost + items[j][k - 1][0] - items[j][k][0]
+                    if -next_cost >= min_logp:
+                        heapq.heappush(heap, (next_cost, ranks[:j] + (k,) + ranks[j + 1 :], j))
+            if limit is not None and len(heap) > 2 * (limit - popped):
+                heap = heapq.nsmallest(max(0, limit - popped), heap)  # the others can't be used, sorted is a heap
+
+    def factors(self, options, flat=None):
+        # the or nodes of an and, the groups of a single alternative are picked with probability 1 so their own
+        # or nodes are part of the same product
+        if flat is None:
+            flat = []
+        for o in options:
+            if not isinstance(o, (str, charset)) and len(o) == 1 and not isinstance(o[0], str) and len(o[0]) > 0:
+                self.factors(o[0], flat)
+            else:
+                flat.append(o)
+        return flat
+
+    def merge(self, children, options):
+        # rank the products of runs of consecutive sets once and for all, like the odometer, so that the product
+        # above has fewer dimensions to walk
+        merged = []
+        run = []
+        size = 1
+        for c, o in zip(children, options):
+            if not isinstance(o, list) or not all(isinstance(oo, str) for oo in o):
+                merged.extend(self.merge_run(run))
+                merged.append(c)
+                run, size = [], 1
+                continue
+            if size * len(o) > MERGE_LIMIT:
+                merged.extend(self.merge_run(run))
+                run, size = [], 1
+            run.append(c)
+            size *= len(o)
+        merged.extend(self.merge_run(run))
+        return merged
+
+    def merge_run(self, run):
+        if len(run) <= 1:
+            return run
+        items = [(0.0, "", ())]
+        for c in run:
+            c.get(MERGE_LIMIT)
+            items = [(p + q, s + t, ranks + (k,)) for p, s, ranks in items for k, (q, t) in enumerate(c.items)]
+        items.sort(key=lambda item: (-item[0], item[2]))  # ties in the same order as the product above
+        return [ranked(self.bounded((p, s) for p, s, _ in items))]
+
+    def or_gen(self, options):
+        # merge of the rankings of the alternatives, each one scaled by its probability
+        weights = self.model.weights(options)
+        alternatives = [(w, self.and_ranked(o)) for w, o in zip(weights, options) if w > 0]
+        alternatives = [(w, r) for w, r in alternatives if r.get(0) is not None]  # an empty and is never picked
+        total = sum(w for w, _ in alternatives)
+        heap = []
+        for i, (w, r) in enumerate(alternatives):
+            heap.append((-(log(w / total) + r.items[0][0]), i, 0))
+        heapq.heapify(heap)
+        while heap:
+            cost, i, k = heapq.heappop(heap)
+            w, r = alternatives[i]
+            yield (-cost, r.items[k][1])
+            item = r.get(k + 1)
+            if item is not None:
+                heapq.heappush(heap, (-(log(w / total) + item[0]), i, k + 1))
+
+    def repeat_gen(self, options):
+        # the levels of a repeat as or_gen() and and_gen() would rank them, without a ranking per level: a string is
+        # a sequence of strings of the option, reached from a single parent, the same sequence with its last string
+        # one rank more likely, or without it when it is the most likely one. Each level goes on with the option or
+        # stops, the last one can only stop, so with levels weighing the same, as in the expansions, both parents
+        # are at least as likely
+        weights = self.model.weights(options)
+        if not 0 < weights[0] == weights[1]:
+            yield from self.or_gen(options)
+            return
+        option = self.or_ranked(options.option)
+        if option.get(0) is None:
+            yield (0.0, "")  # only the empty string can be picked
+            return
+        level = log(0.5)
+        count, items, min_logp = options.count, option.items, self.min_logp
+
+        def cost(n, logp):
+            # of a sequence of n strings whose log probabilities add up to logp
+            return -(logp + min(n + 1, count) * level)
+
+        # (cost, ranks of the strings followed by inf, the strings before the last, their log probability), the
+        # ranks break the ties in the order of the walk, a sequence before the ones it extends
+        heap = [(cost(0, 0.0), (inf,), "", 0.0)]
+        while heap:
+            c, ranks, before, logp = heapq.heappop(heap)
+            n = len(ranks) - 1
+            k = ranks[-2] if n > 0 else 0
+            g = before + items[k][1] if n > 0 else before
+            if n > 0 and option.get(k + 1) is not None and -cost(n, logp + items[k + 1][0]) >= min_logp:
+                heapq.heappush(heap, (cost(n, logp + items[k + 1][0]), ranks[:-2] + (k + 1, inf), before, logp))
+            if n == count:
+                yield (-c, g)
+                continue
+            logp += items[k][0] if n > 0 else 0.0
+            if cost(n + 1, logp + items[0][0]) == c:
+                # the last level after an option string of probability 1, the extension comes first
+                yield (-c, g + items[0][1])
+                ranks, before, k = ranks[:-1] + (0, inf), g, 0
+                if option.get(1) is not None and -cost(n + 1, logp + items[1][0]) >= min_logp:
+                    heapq.heappush(heap, (cost(n + 1, logp + items[1][0]), ranks[:-2] + (1, inf), before, logp))
+            elif -cost(n + 1, logp + items[0][0]) >= min_logp:
+                heapq.heappush(heap, (cost(n + 1, logp + items[0][0]), ranks[:-1] + (0, inf), g, logp))
+            yield (-c, g)
+
+    def charset_gen(self, options):
+        # the characters with a weight of their own are sorted, all the others share the default one
+        default = self.model.default
+        own = {c: w for c, w in self.model.chars.items() if c in options and w > 0}
+        n = len(options) - options.optional - len(own)
+        total = sum(own.values()) + default * (n + options.optional)
+        if total <= 0:
+            return
+        ranked_own = sorted(own.items(), key=lambda t: -t[1])
+        above = [(log(w / total), c) for c, w in ranked_own if w >= default]
+        below = [(log(w / total), c) for c, w in ranked_own if w < default]
+        yield from above
+        if default > 0:
+            logp = log(default / total)
+            yield from ((logp, c) for c in options if c not in own)
+        yield from below
+
+
+# strings of the rule in non increasing probability, at most top of them and no less likely than min_prob
+# a string generated by several ways of matching the rule comes once per way, or only the most likely one with unique
+def gen(options, weights=None, top=None, min_prob=None, unique=False, max_len=None, with_prob=False):
+    if unbounded.unbounded(options):
+        if max_len is None:
+            raise ValueError("the rule generates infinitely many strings, give a max_len")
+        options = unbounded.expand(options, max_len)
+    if weights is None:
+        weights = model(options)
+    min_logp = log(min_prob) if min_prob is not None and min_prob > 0 else -inf
+    if unique or max_len is not None:
+        generated = filtered(options, weights, top, min_logp, max_len, unique)
+    else:
+        r = ranker(weights, limit=top, min_logp=min_logp)
+        generated = islice(r.bounded(r.and_gen(options)), top)
+    if with_prob:
+        return ((s, exp(logp)) for logp, s in generated)
+    return (s for _, s in generated)
+
+
+def filtered(options, weights, top, min_logp, max_len, unique):
+    # the top items no longer than max_len, and only the first of each string with unique: the nodes still rank at
+    # most limit strings, the first ones being the same whatever the limit, and when all of them are used before top
+    # are kept the ranking starts again with a larger limit, after the items already yielded
+    limit = None if top is None else top * SLACK
+    kept = 0
+    while True:
+        r = ranker(weights, limit=limit, min_logp=min_logp)
+        seen = set()  # strings of the ranking so far, at most limit of them
+        n = k = 0
+        for item in r.bounded(r.and_gen(options)):
+            n += 1
+            if (max_len is not None and len(item[1]) > max_len) or item[1] in seen:
+                continue
+            if unique:
+                seen.add(item[1])
+            k += 1
+            if k > kept:
+                yield item
+                kept = k
+                if kept == top:
+                    return
+        if limit is None or n < limit:
+            return  # no node reached the limit, nothing more to rank
+        limit *= 2